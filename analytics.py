@@ -0,0 +1,161 @@
+# analytics.py - Offline analytics over the conversation journal
+import argparse
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from journal import list_segments, read_segment
+
+NO_MATCH_PREFIX = "I couldn't find any schemes"
+# Numbered list replies (format_scheme_list) open with how many schemes they show
+LIST_RESPONSE = re.compile(r"I found (\d+) schemes? matching")
+QUERY_COUNTER_CAPACITY = 50000  # distinct free-text queries tracked per counter
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+def prune(counter: Counter, capacity: int = QUERY_COUNTER_CAPACITY):
+    """Keep a free-text counter bounded by dropping its long tail once it doubles past capacity"""
+    if len(counter) > capacity * 2:
+        kept = counter.most_common(capacity)
+        counter.clear()
+        counter.update(dict(kept))
+
+def turns(events: Iterable[Dict]) -> Iterator[Dict]:
+    return (event for event in events if event.get("type") == "turn")
+
+def summarize_events(events: Iterable[Dict]) -> Dict[str, Counter]:
+    """Fold a stream of journal events into counters, holding only the counters in memory"""
+    summary = {name: Counter() for name in (
+        "totals", "intents", "states", "domains", "state_domain",
+        "queries", "zero_result_queries", "impressions", "clicks"
+    )}
+
+    for turn in turns(events):
+        totals = summary["totals"]
+        totals["turns"] += 1
+        query = turn.get("query", "")
+        schemes = turn.get("schemes") or []
+        state, domain = turn.get("state"), turn.get("domain")
+
+        summary["intents"][turn.get("intent") or "unknown"] += 1
+        summary["states"][state or "(none)"] += 1
+        summary["domains"][domain or "(none)"] += 1
+        if state or domain:
+            summary["state_domain"][f"{state or '*'}|{domain or '*'}"] += 1
+
+        if query.strip().isdigit():
+            # A numbered pick from the previous list: the turn carries the chosen scheme
+            totals["selections"] += 1
+            if len(schemes) == 1:
+                summary["clicks"][schemes[0]] += 1
+            continue
+
+        normalized = normalize_query(query)
+        summary["queries"][normalized] += 1
+        response = turn.get("response", "")
+        listed = LIST_RESPONSE.match(response)
+        if response.startswith(NO_MATCH_PREFIX):
+            totals["zero_result"] += 1
+            summary["zero_result_queries"][normalized] += 1
+        elif listed:
+            # Whatever the intent, a scheme was seen only if the reply listed it
+            totals["list_responses"] += 1
+            for name in schemes[:int(listed.group(1))]:
+                summary["impressions"][name] += 1
+
+        prune(summary["queries"])
+        prune(summary["zero_result_queries"])
+
+    return summary
+
+def summarize_segment(path: str) -> Dict[str, Counter]:
+    """Process-pool task: summarize one journal segment"""
+    return summarize_events(read_segment(path))
+
+def merge(summaries: Iterable[Dict[str, Counter]]) -> Dict[str, Counter]:
+    merged: Dict[str, Counter] = {}
+    for summary in summaries:
+        for name, counter in summary.items():
+            merged.setdefault(name, Counter()).update(counter)
+            if name in ("queries", "zero_result_queries"):
+                prune(merged[name])
+    return merged
+
+def build_report(summary: Dict[str, Counter], top: int) -> Dict:
+    """Turn merged counters into compact, ranked tables"""
+    def table(name: str) -> List[Dict]:
+        return [{"key": key, "count": count} for key, count in summary.get(name, Counter()).most_common(top)]
+
+    totals = summary.get("totals", Counter())
+    impressions = summary.get("impressions", Counter())
+    clicks = summary.get("clicks", Counter())
+    schemes = [
+        {
+            "scheme": name,
+            "impressions": impressions[name],
+            "clicks": clicks[name],
+            "ctr": round(clicks[name] / impressions[name], 4) if impressions[name] else None
+        }
+        for name in sorted(set(impressions) | set(clicks), key=lambda n: (-clicks[n], -impressions[n], n))
+    ][:top]
+
+    return {
+        "totals": dict(totals),
+        "zero_result_rate": round(totals["zero_result"] / totals["turns"], 4) if totals["turns"] else 0.0,
+        "intents": table("intents"),
+        "states": table("states"),
+        "domains": table("domains"),
+        # Hot state x domain pairs are the candidates for precomputed list answers
+        "state_domain": table("state_domain"),
+        "hot_queries": table("queries"),
+        "zero_result_queries": table("zero_result_queries"),
+        "schemes": schemes,
+    }
+
+def print_table(title: str, rows: List[Dict], columns: List[str]):
+    if not rows:
+        return
+    print(f"\n{title}")
+    widths = [max(len(column), *(len(str(row[column])) for row in rows)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+def run(directory: str, workers: Optional[int], top: int, include_active: bool = False) -> Dict:
+    # Read-only: segments a crashed server left unfinalized are renamed when the server next
+    # starts (journal.recover_segments); until then --include-active reads them
+    segments = list_segments(directory, include_active)
+    if not segments:
+        return build_report({}, top)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        summaries = pool.map(summarize_segment, segments)
+        return build_report(merge(summaries), top)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize chat journal segments")
+    parser.add_argument("directory", nargs="?", default="journal", help="Journal directory")
+    parser.add_argument("--output", help="Write the summary tables to this JSON file")
+    parser.add_argument("--top", type=int, default=20, help="Rows kept per table")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Segment-processing processes")
+    parser.add_argument("--include-active", action="store_true", help="Also read segments still being written")
+    args = parser.parse_args()
+
+    report = run(args.directory, args.workers, args.top, args.include_active)
+
+    print(f"Turns: {report['totals'].get('turns', 0)}  "
+          f"zero-result rate: {report['zero_result_rate']:.1%}  "
+          f"selections: {report['totals'].get('selections', 0)}")
+    for name in ("intents", "states", "domains", "state_domain", "hot_queries", "zero_result_queries"):
+        print_table(name.replace("_", " ").title(), report[name], ["key", "count"])
+    print_table("Schemes", report["schemes"], ["scheme", "impressions", "clicks", "ctr"])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
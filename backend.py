@@ -1,18 +1,47 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional
-from datetime import datetime
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional, Tuple, Union
+from datetime import date, datetime, timedelta
+import asyncio
+import bisect
+import gc
+import hashlib
+import heapq
+import hmac
+import json
 import logging
+import math
+import os
 import re
+import sys
+import threading
+import time
+import tracemalloc
 import uuid
+from array import array
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
 from difflib import SequenceMatcher
 
+from journal import ConversationJournal
+from memory_profile import deep_size, process_rss, top_allocations
+from regions import REGION_ALIAS_INDEX, REGION_ANCESTORS, STATE_NEIGHBOURS, detect_region, resolve_region, state_of
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Government Schemes Chatbot API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Flush the conversation journal before the process exits
+    if journal:
+        journal.close()
+
+app = FastAPI(title="Government Schemes Chatbot API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -23,8 +52,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Reject POSTs early when the server is saturated or a client exceeds its rate"""
+    if request.method != "POST":
+        return await call_next(request)
+    
+    reason = admission.admit_request(client_address(request))
+    if reason:
+        return JSONResponse(status_code=429, content={"detail": reason}, headers={"Retry-After": "1"})
+    
+    admission.in_flight += 1
+    started = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        admission.in_flight -= 1
+        degradation.observe(time.perf_counter() - started)
+
 # Pydantic models
 class Scheme(BaseModel):
+    id: Optional[str] = None  # stable URL-safe id, e.g. for /schemes/{id}/related
     name: str
     description: str
     eligibility: str
@@ -32,8 +80,12 @@ class Scheme(BaseModel):
     application_process: str
     required_documents: str
     state: str
+    region: Optional[str] = None  # most specific place the scheme applies in, when narrower or wider than `state`
     domain: str
     official_website: str
+    status: str = "active"             # active, upcoming (awaiting launch) or closed
+    open_date: Optional[str] = None    # ISO dates bounding when applications are accepted, inclusive
+    close_date: Optional[str] = None
 
 class QueryRequest(BaseModel):
     query: str
@@ -44,6 +96,15 @@ class QueryResponse(BaseModel):
     schemes: List[Scheme]
     session_id: str
     timestamp: str
+    degraded: bool = False  # answered from precomputed data under load; not recorded in the session
+
+class HistoryMessage(BaseModel):
+    role: str = Field(max_length=16)
+    content: str = Field(max_length=8000)
+    timestamp: str = Field(max_length=64)
+
+class HistoryArchiveRequest(BaseModel):
+    messages: List[HistoryMessage] = Field(max_length=50)
 
 # Government schemes database
 SCHEMES_DATABASE = [
@@ -155,7 +216,8 @@ SCHEMES_DATABASE = [
         "required_documents": "Any government ID proof showing Karnataka address",
         "state": "Karnataka",
         "domain": "Transport",
-        "official_website": "https://sevasindhugs.karnataka.gov.in/"
+        "official_website": "https://sevasindhugs.karnataka.gov.in/",
+        "open_date": "2023-06-11"
     },
     {
         "name": "Gruha Jyothi",
@@ -210,7 +272,8 @@ SCHEMES_DATABASE = [
         "required_documents": "Birth certificate, Income certificate, School certificates",
         "state": "Maharashtra",
         "domain": "Women Welfare",
-        "official_website": "https://womenchild.maharashtra.gov.in/"
+        "official_website": "https://womenchild.maharashtra.gov.in/",
+        "open_date": "2023-04-01"
     },
     {
         "name": "Rythu Bandhu",
@@ -254,7 +317,8 @@ SCHEMES_DATABASE = [
         "required_documents": "Caste certificate, Income certificate, Aadhaar card, Business plan",
         "state": "Telangana",
         "domain": "Entrepreneurship",
-        "official_website": "https://dalitbandhu.telangana.gov.in/"
+        "official_website": "https://dalitbandhu.telangana.gov.in/",
+        "status": "upcoming"
     },
     {
         "name": "Aadabidda Nidhi",
@@ -299,11 +363,341 @@ SCHEMES_DATABASE = [
         "state": "Andhra Pradesh",
         "domain": "Health",
         "official_website": "https://www.ntrvaidyaseva.ap.gov.in/"
+    },
+    {
+        "name": "Annapurna ₹5 Meal Scheme",
+        "description": "Subsidised hot meals served at Annapurna canteens across Greater Hyderabad by the municipal corporation.",
+        "eligibility": "Open to everyone, aimed at daily wage workers, students and low-income residents",
+        "benefits": "A full meal of rice, dal, sambar and curry for ₹5",
+        "application_process": "No registration needed. Visit any Annapurna canteen during serving hours and pay at the counter.",
+        "required_documents": "None",
+        "state": "Telangana",
+        "region": "Hyderabad",
+        "domain": "Food Security",
+        "official_website": "https://www.ghmc.gov.in/"
+    },
+    {
+        "name": "Ayushman Bharat Pradhan Mantri Jan Arogya Yojana (PMJAY)",
+        "description": "Central health assurance scheme providing cashless secondary and tertiary hospital care at empaneled public and private hospitals.",
+        "eligibility": "Poor and vulnerable families identified from SECC 2011 deprivation criteria, and all senior citizens aged 70 and above",
+        "benefits": "Cashless treatment up to ₹5 lakh per family per year for hospitalisation",
+        "application_process": "Check eligibility on the beneficiary portal or with an Ayushman Mitra at an empaneled hospital. Complete e-KYC and download the Ayushman card.",
+        "required_documents": "Aadhaar card, Ration card, Mobile number linked to Aadhaar",
+        "state": "Central",
+        "region": "India",
+        "domain": "Health",
+        "official_website": "https://pmjay.gov.in/"
+    },
+    {
+        "name": "PM-KISAN (Pradhan Mantri Kisan Samman Nidhi)",
+        "description": "Central income support scheme for landholding farmer families, paid by direct benefit transfer.",
+        "eligibility": "Landholding farmer families, excluding income tax payers, institutional landholders and families with members in listed higher-income categories",
+        "benefits": "₹6,000 per year in three instalments of ₹2,000",
+        "application_process": "Register on the PM-KISAN portal under New Farmer Registration, or through a Common Service Centre or the state agriculture office. Complete e-KYC.",
+        "required_documents": "Aadhaar card, Land ownership records, Bank account details",
+        "state": "Central",
+        "region": "India",
+        "domain": "Agriculture",
+        "official_website": "https://pmkisan.gov.in/"
     }
 ]
 
-# Session management
-sessions = {}
+# Catalog version tag used for HTTP revalidation of browse endpoints (see catalog_etag)
+CATALOG_HASH = hashlib.sha1(json.dumps(SCHEMES_DATABASE, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def make_scheme_id(name: str) -> str:
+    """The scheme's bracketed acronym if it has one, else its name without the bracketed part, as lower-case words joined by hyphens"""
+    acronyms = re.findall(r"\(([A-Z]{2,})\)", name)
+    words = re.findall(r"[a-z0-9]+", (acronyms[0] if acronyms else re.sub(r"\s*\(.*?\)", "", name)).lower())
+    return "-".join(words)
+
+def build_scheme_ids() -> Dict[str, Dict]:
+    scheme_ids: Dict[str, Dict] = {}
+    for scheme in SCHEMES_DATABASE:
+        scheme_id = make_scheme_id(scheme['name'])
+        if scheme_id in scheme_ids:
+            raise ValueError(f"Scheme id {scheme_id!r} is shared by {scheme_ids[scheme_id]['name']!r} and {scheme['name']!r}")
+        scheme_ids[scheme_id] = scheme
+    return scheme_ids
+
+SCHEMES_BY_ID = build_scheme_ids()
+SCHEME_POSITIONS = {scheme['name']: position for position, scheme in enumerate(SCHEMES_DATABASE)}
+
+# Validated models for every catalog entry, shared by all responses
+SCHEME_MODELS = {scheme['name']: Scheme(**scheme, id=scheme_id) for scheme_id, scheme in SCHEMES_BY_ID.items()}
+
+class LifecycleIndex:
+    """Tracks which catalog entries are open today without rescanning the catalog.
+
+    Opening and closing days of dated schemes form one time-sorted list of transitions.
+    A cursor moves through it as days pass (bisect, O(log n)), applying each transition once;
+    until the next transition is due a refresh is a single comparison. Schemes marked
+    `upcoming` or `closed` without dates stay that way until the catalog changes."""
+
+    def __init__(self, schemes: List[Dict]):
+        self.inactive: Dict[str, str] = {}  # scheme name -> "upcoming" or "closed"
+        transitions = []
+        for scheme in schemes:
+            name, status = scheme['name'], scheme.get('status', 'active')
+            if status == 'closed' or (status == 'upcoming' and not scheme.get('open_date')):
+                self.inactive[name] = status
+                continue
+            if scheme.get('open_date'):
+                self.inactive[name] = 'upcoming'
+                transitions.append((scheme['open_date'], name, None))
+            if scheme.get('close_date'):
+                closes_after = date.fromisoformat(scheme['close_date']) + timedelta(days=1)
+                transitions.append((closes_after.isoformat(), name, 'closed'))
+        transitions.sort()
+        self.transitions = transitions
+        self.days = [day for day, _, _ in transitions]
+        self.cursor = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, today: Optional[str] = None) -> bool:
+        """Apply transitions due by `today` (ISO date, default the current date); True if anything changed"""
+        if self.cursor == len(self.days):
+            return False
+        today = today or date.today().isoformat()
+        if today < self.days[self.cursor]:
+            return False
+        # Searches run in worker threads too; only one of them applies the transitions
+        with self._lock:
+            end = bisect.bisect_right(self.days, today, lo=self.cursor)
+            if end == self.cursor:
+                return False
+            for _, name, status in self.transitions[self.cursor:end]:
+                if status is None:
+                    self.inactive.pop(name, None)
+                else:
+                    self.inactive[name] = status
+            self.cursor = end
+        logger.info(f"Scheme lifecycle changed, {len(self.inactive)} inactive schemes")
+        return True
+
+    @property
+    def version(self) -> int:
+        """Transitions applied so far. It depends only on the date, so every worker reports the
+        same version for the same inactive set however many refreshes it took to get there"""
+        return self.cursor
+
+    def status(self, scheme: Dict) -> str:
+        return self.inactive.get(scheme['name'], 'active')
+
+    def is_active(self, scheme: Dict) -> bool:
+        return scheme['name'] not in self.inactive
+
+lifecycle = LifecycleIndex(SCHEMES_DATABASE)
+lifecycle.refresh()
+
+def catalog_etag() -> str:
+    """Changes with the catalog and whenever a scheme opens or closes, so cached browse results revalidate"""
+    lifecycle.refresh()
+    return f'W/"{CATALOG_HASH}-{lifecycle.version}"'
+
+def scheme_model(scheme: Dict) -> Scheme:
+    """The response model for a scheme, carrying its status as of today"""
+    model = SCHEME_MODELS[scheme['name']]
+    status = lifecycle.status(scheme)
+    return model if model.status == status else model.model_copy(update={"status": status})
+
+# The same models as plain dicts, for WebSocket frames that are sent without model validation
+SCHEME_PAYLOADS = {name: model.model_dump() for name, model in SCHEME_MODELS.items()}
+
+def scheme_payload(scheme: Dict) -> Dict:
+    """scheme_model(scheme) as a JSON-ready dict"""
+    payload = SCHEME_PAYLOADS[scheme['name']]
+    status = lifecycle.status(scheme)
+    return payload if payload['status'] == status else {**payload, "status": status}
+
+# Session management (least recently used first, capped at MAX_SESSIONS)
+MAX_SESSIONS = 10000
+MAX_SESSION_MESSAGES = 500  # stored history per session; the oldest messages go first
+sessions = OrderedDict()
+
+# Admission control limits (CHATBOT_ADMISSION_CONTROL=off disables them, e.g. for load tests)
+ADMISSION_CONTROL_ENABLED = os.environ.get("CHATBOT_ADMISSION_CONTROL", "on").lower() != "off"
+MAX_CONCURRENT_REQUESTS = 64         # in-flight POSTs and WebSocket turns before POSTs get fast 429s
+IP_RATE, IP_BURST = 10.0, 20.0        # requests/second per client address
+SESSION_RATE, SESSION_BURST = 2.0, 5.0  # chat turns/second per session
+NEW_SESSION_RATE, NEW_SESSION_BURST = 1.0, 10.0  # session creations/second per client address
+BUCKET_SLOTS = 4096
+
+class TokenBuckets:
+    """Fixed-size table of token buckets. Keys hash into slots, so memory and time per
+    check stay constant however many distinct clients or sessions show up; colliding
+    keys simply share a bucket."""
+
+    def __init__(self, rate: float, burst: float, slots: int = BUCKET_SLOTS):
+        self.rate = rate
+        self.burst = burst
+        self.slots = slots
+        self.tokens = array('d', [burst]) * slots
+        self.updated = array('d', [0.0]) * slots
+
+    def take(self, key: str, now: float) -> bool:
+        slot = hash(key) % self.slots
+        tokens = min(self.burst, self.tokens[slot] + (now - self.updated[slot]) * self.rate)
+        self.updated[slot] = now
+        if tokens < 1.0:
+            self.tokens[slot] = tokens
+            return False
+        self.tokens[slot] = tokens - 1.0
+        return True
+
+class AdmissionController:
+    """Per-IP and per-session rate limits plus a global concurrency cap"""
+
+    def __init__(self):
+        self.ip_buckets = TokenBuckets(IP_RATE, IP_BURST)
+        self.session_buckets = TokenBuckets(SESSION_RATE, SESSION_BURST)
+        self.new_session_buckets = TokenBuckets(NEW_SESSION_RATE, NEW_SESSION_BURST)
+        self.in_flight = 0
+        self.rejected = 0
+
+    def admit_request(self, client_ip: str) -> Optional[str]:
+        """Return a rejection reason, or None if the request may proceed"""
+        if not ADMISSION_CONTROL_ENABLED:
+            return None
+        if self.in_flight >= MAX_CONCURRENT_REQUESTS:
+            self.rejected += 1
+            return "Server is busy, please retry shortly"
+        if not self.ip_buckets.take(client_ip, time.monotonic()):
+            self.rejected += 1
+            return "Too many requests from this address"
+        return None
+
+    def admit_session(self, session_id: Optional[str], client_ip: str) -> Optional[str]:
+        """Rate-limit turns on an existing session, or session creation for a new one"""
+        if not ADMISSION_CONTROL_ENABLED:
+            return None
+        now = time.monotonic()
+        if session_id is None or session_id not in sessions:
+            if not self.new_session_buckets.take(client_ip, now):
+                self.rejected += 1
+                return "Too many new sessions from this address"
+        elif not self.session_buckets.take(session_id, now):
+            self.rejected += 1
+            return "Too many messages in this session"
+        return None
+
+    def admit_message(self, session_id: str, client_ip: str) -> Optional[str]:
+        """Rate-limit one message on an already open WebSocket"""
+        if not ADMISSION_CONTROL_ENABLED:
+            return None
+        now = time.monotonic()
+        if not self.ip_buckets.take(client_ip, now) or not self.session_buckets.take(session_id, now):
+            self.rejected += 1
+            return "Too many requests, please slow down"
+        return None
+
+admission = AdmissionController()
+
+# Degraded serving: under overload /chat answers from precomputed lists and fragments.
+# CHATBOT_DEGRADED_MODE=auto switches on thresholds; "on" and "off" pin the mode.
+DEGRADED_MODE = os.environ.get("CHATBOT_DEGRADED_MODE", "auto").lower()
+DEGRADE_IN_FLIGHT = 48               # in-flight chat turns (POSTs and WebSocket messages) that switch to degraded answers
+DEGRADE_LATENCY_MS = 500             # or smoothed chat latency above this
+RECOVER_IN_FLIGHT = 16               # both must fall back below these to leave degraded mode
+RECOVER_LATENCY_MS = 150
+DEGRADE_HOLD_SECONDS = 5.0           # minimum time in degraded mode, so the mode doesn't flap
+LATENCY_SMOOTHING = 0.2              # weight of the newest sample in the latency average
+LATENCY_HALF_LIFE = 2.0              # seconds for the average to halve when no turns finish
+
+class DegradationController:
+    """Decides per request whether /chat runs the full pipeline or the degraded tier"""
+
+    def __init__(self):
+        self.degraded = DEGRADED_MODE == "on"
+        self.latency_ms = 0.0
+        self.updated = time.monotonic()
+        self.since = self.updated
+        self.switches = 0
+        self.degraded_answers = 0
+
+    def _decay(self, now: float):
+        # Without this the last busy period's average would stay put until traffic returns
+        self.latency_ms *= 0.5 ** ((now - self.updated) / LATENCY_HALF_LIFE)
+        self.updated = now
+
+    def observe(self, seconds: float):
+        """Fold one chat turn's latency (POST or WebSocket message) into the smoothed average"""
+        self._decay(time.monotonic())
+        self.latency_ms += LATENCY_SMOOTHING * (seconds * 1000 - self.latency_ms)
+
+    def check(self, in_flight: int) -> bool:
+        """Return True if this request should get a degraded answer, switching modes as load changes"""
+        if DEGRADED_MODE != "auto":
+            return self.degraded
+        now = time.monotonic()
+        self._decay(now)
+        if not self.degraded:
+            if in_flight >= DEGRADE_IN_FLIGHT or self.latency_ms >= DEGRADE_LATENCY_MS:
+                self._switch(True, now, in_flight)
+        elif (now - self.since >= DEGRADE_HOLD_SECONDS and in_flight <= RECOVER_IN_FLIGHT
+              and self.latency_ms <= RECOVER_LATENCY_MS):
+            self._switch(False, now, in_flight)
+        return self.degraded
+
+    def _switch(self, degraded: bool, now: float, in_flight: int):
+        self.degraded = degraded
+        self.since = now
+        self.switches += 1
+        logger.warning(f"Serving mode -> {'degraded' if degraded else 'normal'} "
+                       f"(in flight {in_flight}, latency {self.latency_ms:.0f} ms)")
+
+degradation = DegradationController()
+
+# Conversation journal (CHATBOT_JOURNAL_DIR=off disables it)
+JOURNAL_DIR = os.environ.get("CHATBOT_JOURNAL_DIR", "journal")
+journal = ConversationJournal(JOURNAL_DIR) if JOURNAL_DIR.lower() != "off" else None
+
+def journal_event(event: Dict):
+    if journal:
+        journal.record(event)
+
+# Request coalescing (CHATBOT_COALESCING=off disables it)
+COALESCING_ENABLED = os.environ.get("CHATBOT_COALESCING", "on").lower() != "off"
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one computation.
+
+    The first caller runs the function in a worker thread, which keeps the event loop free
+    to accept identical requests meanwhile; those await the same task and share its result.
+    Results must be treated as read-only by every caller."""
+
+    def __init__(self):
+        self.in_flight: Dict[Tuple, asyncio.Task] = {}
+        self.shared = 0
+
+    async def run(self, key: Tuple, fn, *args):
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.shared += 1
+        # Shielded so a caller that disconnects doesn't cancel the work others are waiting on
+        return await asyncio.shield(task)
+
+search_flight = SingleFlight()
+
+# Peers allowed to name the real client in X-Forwarded-For: the Streamlit frontend and the
+# serve.py router run next to the backend, so without this every user shares their address
+TRUSTED_PROXIES = {address.strip() for address in os.environ.get("CHATBOT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+                   if address.strip()}
+
+def client_address(connection) -> str:
+    """The address per-IP limits apply to: the peer, or the nearest untrusted hop it forwarded for"""
+    address = connection.client.host if connection.client else "unknown"
+    if address not in TRUSTED_PROXIES:
+        return address
+    for hop in reversed(connection.headers.get("x-forwarded-for", "").split(",")):
+        address = hop.strip() or address
+        if address not in TRUSTED_PROXIES:
+            break
+    return address
 
 # FIX: Update the ConversationContext class to include missing attributes
 class ConversationContext:
@@ -314,6 +708,8 @@ class ConversationContext:
         self.last_schemes = []
         self.last_query_type = None  # ADD THIS LINE
         self.conversation_step = 0   # ADD THIS LINE
+        self.last_search = None      # query, filters and candidate pool of the last list search
+        self.token = None            # client secret that must accompany history reads and writes
 
 # FIX: Also update the get_or_create_session function to handle existing sessions
 def get_or_create_session(session_id: Optional[str] = None) -> ConversationContext:
@@ -321,8 +717,13 @@ def get_or_create_session(session_id: Optional[str] = None) -> ConversationConte
         session_id = str(uuid.uuid4())
     
     if session_id not in sessions:
+        # Drop the least recently used session once the cap is reached
+        while len(sessions) >= MAX_SESSIONS:
+            evicted_id, _ = sessions.popitem(last=False)
+            logger.info(f"Session limit reached, evicted {evicted_id}")
         sessions[session_id] = ConversationContext(session_id)
     else:
+        sessions.move_to_end(session_id)
         # Ensure existing sessions have the new attributes
         context = sessions[session_id]
         if not hasattr(context, 'last_query_type'):
@@ -332,10 +733,21 @@ def get_or_create_session(session_id: Optional[str] = None) -> ConversationConte
     
     return sessions[session_id]
 
-# FIX: Also fix the uvicorn run command at the bottom
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8001, reload=True)  # Changed port to 8001 to match frontend
+# Clients send a random per-session secret; the first request that carries one binds it
+SESSION_TOKEN_HEADER = "x-session-token"
+MIN_SESSION_TOKEN_LENGTH = 16
+
+def bind_session_token(context: ConversationContext, token: Optional[str]):
+    if context.token is None and token and len(token) >= MIN_SESSION_TOKEN_LENGTH:
+        context.token = token
+
+def require_session_token(context: ConversationContext, token: Optional[str]):
+    if context.token is None or not hmac.compare_digest((token or "").encode(), context.token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid session token")
+
+def cap_session_messages(context: ConversationContext):
+    if len(context.messages) > MAX_SESSION_MESSAGES:
+        del context.messages[:-MAX_SESSION_MESSAGES]
 
 # Text processing utilities
 def extract_keywords(text: str) -> List[str]:
@@ -358,85 +770,99 @@ def similarity_score(text1: str, text2: str) -> float:
     return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
 
 # Query processing functions
+DOMAIN_KEYWORDS = {
+    'Health': ['health', 'medical', 'hospital', 'insurance', 'treatment', 'healthcare', 'medicine'],
+    'Education': ['education', 'scholarship', 'student', 'school', 'college', 'study', 'academic'],
+    'Women Welfare': ['women', 'woman', 'girl', 'female', 'mother', 'ladies'],
+    'Agriculture': ['agriculture', 'farming', 'farmer', 'crop', 'land', 'agricultural'],
+    'Transport': ['transport', 'bus', 'travel', 'free travel', 'transportation'],
+    'Social Welfare': ['pension', 'elderly', 'old age', 'disabled', 'welfare'],
+    'Food Security': ['food', 'ration', 'rice', 'grain'],
+    'Electricity': ['electricity', 'power', 'electric'],
+    'Entrepreneurship': ['business', 'enterprise', 'entrepreneurship', 'startup']
+}
+
+# All domain keywords in one alternation, longest first, matched on word boundaries (plurals
+# allowed) so "bus" doesn't fire inside "business" or "ration" inside "registration"
+DOMAIN_BY_KEYWORD = {keyword: domain for domain, keywords in DOMAIN_KEYWORDS.items() for keyword in keywords}
+DOMAIN_ORDER = {domain: i for i, domain in enumerate(DOMAIN_KEYWORDS)}
+DOMAIN_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(keyword) for keyword in sorted(DOMAIN_BY_KEYWORD, key=len, reverse=True)) + r")(?:s|es)?\b"
+)
+
 def detect_state(query: str) -> Optional[str]:
-    state_aliases = {
-        'Tamil Nadu': ['tamil nadu', 'tn', 'tamilnadu'],
-        'Kerala': ['kerala', 'kl'],
-        'Karnataka': ['karnataka', 'kt', 'ka'],
-        'Andhra Pradesh': ['andhra pradesh', 'ap', 'andhra'],
-        'Telangana': ['telangana', 'ts', 'tg'],
-        'Maharashtra': ['maharashtra', 'mh'],
-        'Puducherry': ['puducherry', 'pondicherry', 'py']
-    }
-    
-    query_lower = query.lower()
-    for state, aliases in state_aliases.items():
-        if any(alias in query_lower for alias in aliases):
-            return state
-    return None
+    return state_of(detect_region(query))
 
 def detect_domain(query: str) -> Optional[str]:
-    domain_keywords = {
-        'Health': ['health', 'medical', 'hospital', 'insurance', 'treatment', 'healthcare', 'medicine'],
-        'Education': ['education', 'scholarship', 'student', 'school', 'college', 'study', 'academic'],
-        'Women Welfare': ['women', 'woman', 'girl', 'female', 'mother', 'ladies'],
-        'Agriculture': ['agriculture', 'farming', 'farmer', 'crop', 'land', 'agricultural'],
-        'Transport': ['transport', 'bus', 'travel', 'free travel', 'transportation'],
-        'Social Welfare': ['pension', 'elderly', 'old age', 'disabled', 'welfare'],
-        'Food Security': ['food', 'ration', 'rice', 'grain'],
-        'Electricity': ['electricity', 'power', 'electric'],
-        'Entrepreneurship': ['business', 'enterprise', 'entrepreneurship', 'startup']
+    domains = {DOMAIN_BY_KEYWORD[match.group(1)] for match in DOMAIN_PATTERN.finditer(query.lower())}
+    # Several domains named: the one listed first in DOMAIN_KEYWORDS wins, as before
+    return min(domains, key=DOMAIN_ORDER.get) if domains else None
+
+def scheme_region(scheme: Dict) -> str:
+    return scheme.get('region') or scheme['state']
+
+def build_region_schemes() -> Dict[str, List[Dict]]:
+    """Every region's applicable schemes (its own, its ancestors' and central ones), in catalog order"""
+    return {
+        region: [scheme for scheme in SCHEMES_DATABASE if scheme_region(scheme) in ancestors]
+        for region, ancestors in REGION_ANCESTORS.items()
     }
-    
-    query_lower = query.lower()
-    for domain, keywords in domain_keywords.items():
-        if any(keyword in query_lower for keyword in keywords):
-            return domain
-    return None
+
+REGION_SCHEMES = build_region_schemes()
+
+def region_candidates(region: Optional[str]) -> List[Dict]:
+    """Schemes that can match a search scoped to `region`; the whole catalog when unscoped"""
+    return REGION_SCHEMES.get(region, []) if region else SCHEMES_DATABASE
+
+# Intent keywords, checked in order; matched as whole words so "hi" doesn't fire inside "Delhi"
+INTENT_KEYWORDS = [
+    ('greeting', ['hello', 'hi', 'hey', 'good morning', 'good evening']),
+    ('thanks', ['thank', 'thanks', 'thank you']),
+    ('eligibility', ['eligibility', 'eligible', 'qualify', 'who can apply']),
+    ('benefits', ['benefit', 'benefits', 'what do i get', 'what will i get']),
+    ('application', ['apply', 'application', 'how to apply', 'registration', 'register']),
+    ('website', ['link', 'website', 'official', 'registration link']),
+    ('documents', ['document', 'documents', 'papers', 'required']),
+    ('list', ['list', 'show', 'tell me about', 'schemes', 'available']),
+]
+INTENT_PATTERNS = [
+    (intent, re.compile(r"\b(" + "|".join(re.escape(keyword) for keyword in keywords) + r")\b"))
+    for intent, keywords in INTENT_KEYWORDS
+]
 
 def detect_intent(query: str) -> str:
     query_lower = query.lower()
-    
-    if any(word in query_lower for word in ['hello', 'hi', 'hey', 'good morning', 'good evening']):
-        return 'greeting'
-    
-    if any(word in query_lower for word in ['thank', 'thanks', 'thank you']):
-        return 'thanks'
-    
-    if any(word in query_lower for word in ['eligibility', 'eligible', 'qualify', 'who can apply']):
-        return 'eligibility'
-    
-    if any(word in query_lower for word in ['benefit', 'benefits', 'what do i get', 'what will i get']):
-        return 'benefits'
-    
-    if any(word in query_lower for word in ['apply', 'application', 'how to apply', 'registration', 'register']):
-        return 'application'
-    
-    if any(word in query_lower for word in ['link', 'website', 'official', 'registration link']):
-        return 'website'
-    
-    if any(word in query_lower for word in ['document', 'documents', 'papers', 'required']):
-        return 'documents'
-    
-    if any(word in query_lower for word in ['list', 'show', 'tell me about', 'schemes', 'available']):
-        return 'list'
-    
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(query_lower):
+            return intent
     return 'general'
 
-def find_schemes(query: str, state: Optional[str] = None, domain: Optional[str] = None) -> List[Dict]:
+def score_schemes(query: str, state: Optional[str], domain: Optional[str], candidates: List[Dict],
+                  active_only: bool = True) -> List[Tuple[int, Dict]]:
+    """Score candidates against a query, keeping catalog order; schemes failing a filter are dropped.
+    
+    `state` may be any region: schemes of that region or one containing it pass, and each
+    level up the hierarchy scores 100 less, so local schemes rank above state and central ones.
+    `active_only=False` keeps schemes not open today, for rankings that outlive today."""
     relevant_schemes = []
     query_keywords = extract_keywords(query)
+    ancestors = REGION_ANCESTORS.get(resolve_region(state), ()) if state else ()
+    lifecycle.refresh()
     
-    for scheme in SCHEMES_DATABASE:
+    for scheme in candidates:
+        # Schemes not open today never appear in lists (asking for one by name still works)
+        if active_only and not lifecycle.is_active(scheme):
+            continue
         score = 0
         
         if similarity_score(query, scheme['name']) > 0.6:
             score += 1000
         
-        if state and scheme['state'].lower() == state.lower():
-            score += 500
-        elif state and scheme['state'].lower() != state.lower():
-            continue
+        if state:
+            region = scheme_region(scheme)
+            if region not in ancestors:
+                continue
+            score += 500 - 100 * ancestors.index(region)
         
         if domain and scheme['domain'].lower() == domain.lower():
             score += 300
@@ -455,10 +881,307 @@ def find_schemes(query: str, state: Optional[str] = None, domain: Optional[str]
         if score > 0:
             relevant_schemes.append((score, scheme))
     
-    relevant_schemes.sort(key=lambda x: x[0], reverse=True)
-    return [scheme for score, scheme in relevant_schemes[:5]]
+    return relevant_schemes
+
+def top_schemes(scored: List[Tuple[int, Dict]], limit: int = 5) -> List[Dict]:
+    ranked = sorted(scored, key=lambda x: x[0], reverse=True)
+    return [scheme for score, scheme in ranked[:limit]]
+
+def find_schemes(query: str, state: Optional[str] = None, domain: Optional[str] = None) -> List[Dict]:
+    return top_schemes(score_schemes(query, state, domain, region_candidates(resolve_region(state))))
 
-def generate_response(query: str, schemes: List[Dict], intent: str, context: ConversationContext) -> str:
+# Words that mark a follow-up as narrowing the previous list rather than starting over
+# (fillers like "just" and "also" are left out: "just tell me about X" picks X)
+REFINEMENT_CUES = ['only', 'what about', 'how about', 'those', 'ones', 'among', 'filter', 'narrow']
+
+# Place and category words say nothing about which scheme of a list is meant
+GENERIC_NAME_WORDS = {word for phrase in REGION_ALIAS_INDEX for word in phrase.split()}
+
+def match_listed_scheme(query: str, context: ConversationContext) -> Optional[Dict]:
+    """The scheme from the previous list that the query names by a distinctive word of its name"""
+    query_lower = query.lower()
+    for scheme in context.last_schemes:
+        words = [word for word in scheme['name'].lower().split()
+                 if len(word) > 4 and word not in GENERIC_NAME_WORDS and not DOMAIN_PATTERN.fullmatch(word)]
+        if any(word in query_lower for word in words):
+            return scheme
+    return None
+
+def is_refinement(query: str, state: Optional[str], domain: Optional[str], context: ConversationContext) -> bool:
+    last_search = context.last_search
+    if context.last_query_type != 'list' or not last_search:
+        return False
+    # Without a state or domain filter the pool only holds keyword hits, so it can't stand in for the catalog
+    if not (last_search['state'] or last_search['domain']):
+        return False
+    # A place outside the previous one is a new topic, a place inside it (a district of the
+    # state) narrows it; a different domain with a cue ("what about health ones") keeps the
+    # place and searches it again
+    if state and last_search['state'] and last_search['state'] not in REGION_ANCESTORS.get(state, ()):
+        return False
+    # Naming a scheme from the list ("what about Gruha Lakshmi") picks it rather than filtering
+    if match_listed_scheme(query, context):
+        return False
+    query_lower = query.lower()
+    return any(re.search(rf"\b{cue}\b", query_lower) for cue in REFINEMENT_CUES)
+
+def retrieve_schemes(query: str, state: Optional[str], domain: Optional[str], context: ConversationContext,
+                     prefetched: Optional[List[Tuple[int, Dict]]] = None) -> Tuple[List[Dict], bool]:
+    """Find schemes for a turn, re-ranking the previous list's pool when the query refines it.
+    
+    The pool holds every scheme that passed the previous filters, so narrowing it or adding
+    keywords gives the same ranking a full search of the combined query would. `prefetched`
+    is a full-catalog scoring already computed for this query (see prefetch_search)."""
+    refined = is_refinement(query, state, domain, context)
+    if refined and domain and context.last_search['domain'] not in (None, domain):
+        state = state or context.last_search['state']
+        candidates = region_candidates(state)
+    elif refined:
+        last_search = context.last_search
+        query = f"{last_search['query']} {query}"
+        narrowed = state and last_search['state'] and state != last_search['state']
+        state = state or last_search['state']
+        domain = domain or last_search['domain']
+        # The pool only holds schemes covering the whole previous place, so narrowing to a place
+        # inside it takes that place's candidates (its own local schemes included) from the index
+        candidates = region_candidates(state) if narrowed else last_search['candidates']
+    else:
+        candidates = region_candidates(state)
+    
+    if prefetched is not None and not refined:
+        scored = prefetched
+    else:
+        scored = score_schemes(query, state, domain, candidates)
+    if scored:
+        context.last_search = {
+            "query": query,
+            "state": state,
+            "domain": domain,
+            "candidates": [scheme for score, scheme in scored]
+        }
+    return top_schemes(scored), refined
+
+# Typeahead index: a sorted array of lowercase terms, searched by binary search on the prefix
+SUGGESTION_KIND_RANK = {'scheme': 0, 'state': 1, 'domain': 2}
+
+def normalize_term(text: str) -> str:
+    """Lowercase, squash whitespace and collapse repeated letters (so "aarogya" matches "arogya")"""
+    return re.sub(r"(.)\1+", r"\1", " ".join(text.lower().split()))
+
+def build_suggestion_index() -> Tuple[List[str], List[Tuple]]:
+    """Collect completion terms for scheme names, name words, acronyms, place aliases and domain keywords"""
+    entries = set()
+    for scheme in SCHEMES_DATABASE:
+        name = scheme['name']
+        entries.add((normalize_term(name), name, 'scheme', 0))
+        # Every later word of the name, so "gruha" or "arogya" completes mid-name
+        for word in re.findall(r"[a-zA-Z]+", name)[1:]:
+            if len(word) > 2:
+                entries.add((normalize_term(word), name, 'scheme', 1))
+        for acronym in re.findall(r"\(([A-Z]{2,})\)", name):
+            entries.add((normalize_term(acronym), name, 'scheme', 0))
+    # Every known place completes to its canonical name (kind 'state' covers districts and cities too)
+    for alias, region in REGION_ALIAS_INDEX.items():
+        entries.add((normalize_term(alias), region, 'state', 0 if alias == region.lower() else 1))
+    for domain, keywords in DOMAIN_KEYWORDS.items():
+        for keyword in [domain.lower()] + keywords:
+            entries.add((normalize_term(keyword), domain, 'domain', 0 if keyword == domain.lower() else 1))
+    
+    ordered = sorted(entries)
+    return [term for term, *_ in ordered], [tuple(entry[1:]) for entry in ordered]
+
+SUGGEST_TERMS, SUGGEST_ENTRIES = build_suggestion_index()
+SUGGEST_SCAN_LIMIT = 200
+
+def suggest(prefix: str, limit: int = 8) -> List[Dict]:
+    """Ranked completions for a typed prefix"""
+    prefix = normalize_term(prefix)
+    if not prefix:
+        return []
+    
+    candidates = {}
+    start = bisect.bisect_left(SUGGEST_TERMS, prefix)
+    for i in range(start, min(start + SUGGEST_SCAN_LIMIT, len(SUGGEST_TERMS))):
+        term = SUGGEST_TERMS[i]
+        if not term.startswith(prefix):
+            break
+        display, kind, match_rank = SUGGEST_ENTRIES[i]
+        # Exact matches first, then schemes before states before domains, then whole-name matches
+        rank = (term != prefix, SUGGESTION_KIND_RANK[kind], match_rank, len(display))
+        key = (display, kind)
+        if key not in candidates or rank < candidates[key]:
+            candidates[key] = rank
+    
+    ranked = sorted(candidates.items(), key=lambda item: item[1])[:limit]
+    return [{"text": display, "type": kind} for (display, kind), _ in ranked]
+
+# Pre-rendered answer fragments and name lookups, built once at catalog load
+DETAIL_SECTIONS = {
+    'eligibility': ("eligibility", "**Eligibility for {name}:**\n\n{value}"),
+    'benefits': ("benefits", "**Benefits of {name}:**\n\n{value}"),
+    'application': ("application_process", "**How to apply for {name}:**\n\n{value}"),
+    'website': ("official_website", "**Official website for {name}:**\n\n{value}"),
+    'documents': ("required_documents", "**Required documents for {name}:**\n\n{value}"),
+}
+
+DETAIL_MENU = ("What would you like to know about this scheme?\n"
+               "• Eligibility criteria\n"
+               "• Benefits offered\n"
+               "• Application process\n"
+               "• Required documents\n"
+               "• Official website")
+
+def render_fragments(scheme: Dict) -> Dict[str, str]:
+    fragments = {
+        section: template.format(name=scheme['name'], value=scheme[field])
+        for section, (field, template) in DETAIL_SECTIONS.items()
+    }
+    fragments['overview'] = (f"**{scheme['name']}**\n\n"
+                             f"**Description:** {scheme['description']}\n\n" + DETAIL_MENU)
+    fragments['selected'] = (f"You selected **{scheme['name']}** from {scheme['state']}.\n\n"
+                             f"**Description:** {scheme['description']}\n\n" + DETAIL_MENU)
+    return fragments
+
+def build_name_indexes() -> Tuple[Dict[str, List[int]], Dict[str, int]]:
+    """Map distinctive name words (longer than 4 letters) and bracketed acronyms to catalog positions"""
+    name_tokens: Dict[str, List[int]] = {}
+    acronyms: Dict[str, int] = {}
+    for position, scheme in enumerate(SCHEMES_DATABASE):
+        for word in set(re.findall(r"[a-z]+", scheme['name'].lower())):
+            if len(word) > 4:
+                name_tokens.setdefault(word, []).append(position)
+        for acronym in re.findall(r"\(([A-Z]{2,})\)", scheme['name']):
+            acronyms.setdefault(acronym.lower(), position)
+    return name_tokens, acronyms
+
+SCHEME_FRAGMENTS = {scheme['name']: render_fragments(scheme) for scheme in SCHEMES_DATABASE}
+NAME_TOKEN_INDEX, ACRONYM_INDEX = build_name_indexes()
+
+# Related schemes: a scheme-to-scheme similarity graph built once at catalog load and kept as
+# top-k adjacency arrays, so suggestions for a scheme are a slice instead of a catalog scan
+RELATED_FIELDS = ['name', 'description', 'eligibility', 'benefits']
+RELATED_STORED = 10  # neighbours kept per scheme; more than are shown, so closed ones can be skipped
+RELATED_LIMIT = 5    # neighbours returned by /schemes/{id}/related by default
+RELATED_IN_CHAT = 3  # "you may also like" suggestions under a scheme overview
+TEXT_WEIGHT, DOMAIN_WEIGHT, REGION_WEIGHT = 0.5, 0.3, 0.2
+
+# Domains whose schemes are often needed together, e.g. health cover alongside a pension
+COMPLEMENTARY_DOMAINS = [
+    ('Health', 'Social Welfare'), ('Health', 'Women Welfare'), ('Women Welfare', 'Education'),
+    ('Women Welfare', 'Transport'), ('Women Welfare', 'Entrepreneurship'), ('Agriculture', 'Food Security'),
+    ('Social Welfare', 'Food Security'), ('Electricity', 'Food Security'),
+]
+COMPLEMENTS = {pair for a, b in COMPLEMENTARY_DOMAINS for pair in ((a, b), (b, a))}
+
+def domain_affinity(a: Dict, b: Dict) -> float:
+    if a['domain'] == b['domain']:
+        return 1.0
+    return 0.5 if (a['domain'], b['domain']) in COMPLEMENTS else 0.0
+
+def region_affinity(a: Dict, b: Dict) -> float:
+    """1 when one scheme applies wherever the other does (same state, or one is central), 0.5 for neighbouring states"""
+    region_a, region_b = scheme_region(a), scheme_region(b)
+    if region_a in REGION_ANCESTORS.get(region_b, ()) or region_b in REGION_ANCESTORS.get(region_a, ()):
+        return 1.0
+    state_a, state_b = state_of(region_a), state_of(region_b)
+    return 0.5 if state_a and state_b in STATE_NEIGHBOURS.get(state_a, ()) else 0.0
+
+def text_vectors(schemes: List[Dict]) -> List[Dict[str, float]]:
+    """Unit-length TF-IDF vectors over the keywords of each scheme's descriptive fields"""
+    documents = [Counter(extract_keywords(" ".join(scheme[field] for field in RELATED_FIELDS))) for scheme in schemes]
+    document_frequency = Counter(term for document in documents for term in document)
+    vectors = []
+    for document in documents:
+        weights = {term: (1 + math.log(count)) * math.log(len(documents) / document_frequency[term])
+                   for term, count in document.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        vectors.append({term: weight / norm for term, weight in weights.items() if weight})
+    return vectors
+
+def cosine_matrix(vectors: List[Dict[str, float]]) -> List[List[float]]:
+    """All pairwise cosines in one pass over an inverted index: only pairs sharing a term are touched"""
+    postings: Dict[str, List[Tuple[int, float]]] = {}
+    for position, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            postings.setdefault(term, []).append((position, weight))
+    cosines = [[0.0] * len(vectors) for _ in vectors]
+    for entries in postings.values():
+        for i, weight_i in entries:
+            row = cosines[i]
+            for j, weight_j in entries:
+                row[j] += weight_i * weight_j
+    return cosines
+
+def build_related_graph(schemes: List[Dict], k: int = RELATED_STORED) -> Tuple[array, array, array]:
+    """Top-k neighbours of every scheme as CSR arrays: scheme i's neighbours (catalog positions,
+    best first) and their scores are neighbours[offsets[i]:offsets[i + 1]] and scores[...]"""
+    cosines = cosine_matrix(text_vectors(schemes))
+    offsets, neighbours, scores = array('I', [0]), array('I'), array('f')
+    for i, scheme in enumerate(schemes):
+        candidates = [
+            (TEXT_WEIGHT * cosines[i][j] + DOMAIN_WEIGHT * domain_affinity(scheme, other)
+             + REGION_WEIGHT * region_affinity(scheme, other), -j)
+            for j, other in enumerate(schemes) if j != i
+        ]
+        for score, negated in heapq.nlargest(k, candidates):
+            if score <= 0:
+                break
+            neighbours.append(-negated)
+            scores.append(score)
+        offsets.append(len(neighbours))
+    return offsets, neighbours, scores
+
+RELATED_OFFSETS, RELATED_NEIGHBOURS, RELATED_SCORES = build_related_graph(SCHEMES_DATABASE)
+
+def related_schemes(scheme: Dict, limit: int = RELATED_LIMIT) -> List[Tuple[Dict, float]]:
+    """The scheme's closest neighbours that are open today, best first"""
+    position = SCHEME_POSITIONS[scheme['name']]
+    related = []
+    for slot in range(RELATED_OFFSETS[position], RELATED_OFFSETS[position + 1]):
+        if len(related) == limit:
+            break
+        neighbour = SCHEMES_DATABASE[RELATED_NEIGHBOURS[slot]]
+        if lifecycle.is_active(neighbour):
+            related.append((neighbour, RELATED_SCORES[slot]))
+    return related
+
+def related_footer(scheme: Dict) -> str:
+    related = related_schemes(scheme, RELATED_IN_CHAT)
+    if not related:
+        return ""
+    lines = "\n".join(f"• {other['name']} ({other['state']})" for other, _ in related)
+    return f"\n\n**You may also like:**\n{lines}"
+
+def lifecycle_notice(scheme: Dict) -> str:
+    status = lifecycle.status(scheme)
+    if status == 'upcoming':
+        when = f" until {scheme['open_date']}" if scheme.get('open_date') else ""
+        return f"\n\n⚠️ This scheme is not open for applications{when}. Watch the official website for the launch notification."
+    if status == 'closed':
+        when = f" since {scheme['close_date']}" if scheme.get('close_date') else ""
+        return f"\n\n⚠️ This scheme has been closed for applications{when}."
+    return ""
+
+def fragment(scheme: Dict, section: str) -> str:
+    text = SCHEME_FRAGMENTS[scheme['name']][section]
+    if not lifecycle.is_active(scheme):
+        text += lifecycle_notice(scheme)
+    # Viewing a scheme, as opposed to one of its details, suggests related ones
+    if section in ('overview', 'selected'):
+        text += related_footer(scheme)
+    return text
+
+def lookup_scheme_by_name(query: str) -> Optional[Dict]:
+    """The catalog scheme matching the most acronyms or distinctive name words in the query (earliest on ties)"""
+    hits: Dict[int, int] = {}
+    for word in set(re.findall(r"[a-z]+", query.lower())):
+        if word in ACRONYM_INDEX:
+            hits[ACRONYM_INDEX[word]] = hits.get(ACRONYM_INDEX[word], 0) + 1
+        for position in NAME_TOKEN_INDEX.get(word, ()):
+            hits[position] = hits.get(position, 0) + 1
+    return SCHEMES_DATABASE[min(hits, key=lambda position: (-hits[position], position))] if hits else None
+
+def generate_response(query: str, schemes: List[Dict], intent: str, context: ConversationContext, refined: bool = False) -> str:
     query_lower = query.lower()
     
     # Handle greetings and thanks
@@ -489,49 +1212,31 @@ def generate_response(query: str, schemes: List[Dict], intent: str, context: Con
             context.last_query_type = 'specific_info'
             
             if any(word in query_lower for word in ['eligibility', 'eligible', 'qualify', 'criteria', 'who can']):
-                return f"**Eligibility for {scheme['name']}:**\n\n{scheme['eligibility']}"
+                return fragment(scheme, 'eligibility')
             elif any(word in query_lower for word in ['benefit', 'benefits', 'what do i get', 'advantages']):
-                return f"**Benefits of {scheme['name']}:**\n\n{scheme['benefits']}"
+                return fragment(scheme, 'benefits')
             elif any(word in query_lower for word in ['apply', 'application', 'process', 'how to', 'registration']):
-                return f"**How to apply for {scheme['name']}:**\n\n{scheme['application_process']}"
+                return fragment(scheme, 'application')
             elif any(word in query_lower for word in ['website', 'link', 'official', 'portal', 'online']):
-                return f"**Official website for {scheme['name']}:**\n\n{scheme['official_website']}"
+                return fragment(scheme, 'website')
             elif any(word in query_lower for word in ['document', 'documents', 'required', 'papers', 'proof']):
-                return f"**Required documents for {scheme['name']}:**\n\n{scheme['required_documents']}"
+                return fragment(scheme, 'documents')
             else:
                 # Default to showing description again
-                return (f"**{scheme['name']}**\n\n"
-                       f"**Description:** {scheme['description']}\n\n"
-                       "What would you like to know about this scheme?\n"
-                       "• Eligibility criteria\n"
-                       "• Benefits offered\n"
-                       "• Application process\n"
-                       "• Required documents\n"
-                       "• Official website")
+                return fragment(scheme, 'overview')
 
     # Handle direct scheme + info queries like "CMCHIS eligibility"
     if not context.current_scheme and intent in ['eligibility', 'benefits', 'application', 'website', 'documents']:
-        # Try to find the scheme mentioned in the query
-        for scheme in SCHEMES_DATABASE:
-            scheme_name_lower = scheme['name'].lower()
-            if any(word in query_lower for word in scheme_name_lower.split() if len(word) > 4):
-                context.current_scheme = scheme
-                context.last_schemes = [scheme]
-                context.last_query_type = 'specific_info'
-                
-                if intent == 'eligibility':
-                    return f"**Eligibility for {scheme['name']}:**\n\n{scheme['eligibility']}"
-                elif intent == 'benefits':
-                    return f"**Benefits of {scheme['name']}:**\n\n{scheme['benefits']}"
-                elif intent == 'application':
-                    return f"**How to apply for {scheme['name']}:**\n\n{scheme['application_process']}"
-                elif intent == 'website':
-                    return f"**Official website for {scheme['name']}:**\n\n{scheme['official_website']}"
-                elif intent == 'documents':
-                    return f"**Required documents for {scheme['name']}:**\n\n{scheme['required_documents']}"
-
-    # Handle scheme selection from previous list
-    if context.last_query_type == 'list' and context.last_schemes:
+        # Find the scheme mentioned in the query by acronym or name word
+        scheme = lookup_scheme_by_name(query)
+        if scheme:
+            context.current_scheme = scheme
+            context.last_schemes = [scheme]
+            context.last_query_type = 'specific_info'
+            return fragment(scheme, intent)
+
+    # Handle scheme selection from previous list (refinements like "only in Kerala" produce a new list instead)
+    if context.last_query_type == 'list' and context.last_schemes and not refined:
         if query.strip().isdigit():
             try:
                 scheme_index = int(query.strip()) - 1
@@ -539,60 +1244,51 @@ def generate_response(query: str, schemes: List[Dict], intent: str, context: Con
                     selected_scheme = context.last_schemes[scheme_index]
                     context.current_scheme = selected_scheme
                     context.last_query_type = 'scheme_detail'
-                    return (f"**{selected_scheme['name']}**\n\n"
-                           f"**Description:** {selected_scheme['description']}\n\n"
-                           "What would you like to know about this scheme?\n"
-                           "• Eligibility criteria\n"
-                           "• Benefits offered\n" 
-                           "• Application process\n"
-                           "• Required documents\n"
-                           "• Official website")
+                    return fragment(selected_scheme, 'overview')
                 else:
                     return f"Please select a number between 1 and {len(context.last_schemes)}."
             except ValueError:
                 pass
         else:
             # Try to match scheme name from the last list
-            for scheme in context.last_schemes:
-                if any(word in query_lower for word in scheme['name'].lower().split() if len(word) > 4):
-                    context.current_scheme = scheme
-                    context.last_query_type = 'scheme_detail'
-                    return (f"**{scheme['name']}**\n\n"
-                           f"**Description:** {scheme['description']}\n\n"
-                           "What would you like to know about this scheme?\n"
-                           "• Eligibility criteria\n"
-                           "• Benefits offered\n"
-                           "• Application process\n"
-                           "• Required documents\n"
-                           "• Official website")
+            scheme = match_listed_scheme(query, context)
+            if scheme:
+                context.current_scheme = scheme
+                context.last_query_type = 'scheme_detail'
+                return fragment(scheme, 'overview')
 
     # For state+domain queries, ONLY list names
     if schemes:
         context.last_schemes = schemes
         context.last_query_type = 'list'
         context.current_scheme = None
-        
-        scheme_names = []
-        for i, scheme in enumerate(schemes, 1):
-            scheme_names.append(f"{i}. {scheme['name']} ({scheme['state']})")
-        
-        schemes_text = "\n".join(scheme_names)
-        
-        if len(schemes) == 1:
-            return (f"I found 1 scheme matching your query:\n\n"
-                   f"{schemes_text}\n\n"
-                   "Type the number or scheme name to get more details.")
-        else:
-            return (f"I found {len(schemes)} schemes matching your query:\n\n"
-                   f"{schemes_text}\n\n"
-                   "Which scheme would you like to know about? (Type the number or scheme name)")
+    return format_scheme_list(schemes)
 
-    # No schemes found
-    return ("I couldn't find any schemes matching your query.\n\n"
-            "Try being more specific:\n"
-            "• 'Health schemes in Tamil Nadu'\n"
-            "• 'Education scholarships in Kerala'\n"
-            "• 'Women welfare schemes in Karnataka'")
+NO_MATCH_RESPONSE = ("I couldn't find any schemes matching your query.\n\n"
+                     "Try being more specific:\n"
+                     "• 'Health schemes in Tamil Nadu'\n"
+                     "• 'Education scholarships in Kerala'\n"
+                     "• 'Women welfare schemes in Karnataka'")
+
+def format_scheme_list(schemes: List[Dict]) -> str:
+    """The numbered list reply for a search, or the no-match reply when nothing was found"""
+    if not schemes:
+        return NO_MATCH_RESPONSE
+    
+    scheme_names = []
+    for i, scheme in enumerate(schemes, 1):
+        scheme_names.append(f"{i}. {scheme['name']} ({scheme['state']})")
+    
+    schemes_text = "\n".join(scheme_names)
+    
+    if len(schemes) == 1:
+        return (f"I found 1 scheme matching your query:\n\n"
+               f"{schemes_text}\n\n"
+               "Type the number or scheme name to get more details.")
+    else:
+        return (f"I found {len(schemes)} schemes matching your query:\n\n"
+               f"{schemes_text}\n\n"
+               "Which scheme would you like to know about? (Type the number or scheme name)")
 
 # API Routes
 @app.get("/")
@@ -605,69 +1301,188 @@ async def root():
         "total_schemes": len(SCHEMES_DATABASE)
     }
 
+def process_query(query: str, context: ConversationContext,
+                  prefetched: Optional[List[Tuple[int, Dict]]] = None) -> Tuple[str, List[Dict]]:
+    """Run one conversation turn against a session and return the reply and its schemes"""
+    logger.info(f"Received query: {query}")
+    
+    # Add user message to context
+    received_at = datetime.now().isoformat()
+    context.messages.append({
+        "role": "user",
+        "content": query,
+        "timestamp": received_at
+    })
+    
+    # Process query
+    detected_region = detect_region(query)
+    detected_state = state_of(detected_region)
+    detected_domain = detect_domain(query)
+    intent = detect_intent(query)
+    
+    logger.info(f"Detected - State: {detected_state}, Region: {detected_region}, Domain: {detected_domain}, Intent: {intent}")
+    
+    # Handle scheme selection from numbered list
+    if query.strip().isdigit() and context.last_schemes:
+        try:
+            scheme_index = int(query.strip()) - 1
+            if 0 <= scheme_index < len(context.last_schemes):
+                selected_scheme = context.last_schemes[scheme_index]
+                context.current_scheme = selected_scheme
+                schemes = [selected_scheme]
+                response_text = fragment(selected_scheme, 'selected')
+            else:
+                schemes = []
+                response_text = f"Please select a number between 1 and {len(context.last_schemes)}."
+        except ValueError:
+            schemes, refined = retrieve_schemes(query, detected_region, detected_domain, context, prefetched)
+            response_text = generate_response(query, schemes, intent, context, refined)
+    else:
+        # Find relevant schemes, narrowing the previous list when this turn refines it
+        schemes, refined = retrieve_schemes(query, detected_region, detected_domain, context, prefetched)
+        response_text = generate_response(query, schemes, intent, context, refined)
+    
+    # Add assistant response to context
+    context.messages.append({
+        "role": "assistant",
+        "content": response_text,
+        "timestamp": datetime.now().isoformat(),
+        "schemes": schemes
+    })
+    cap_session_messages(context)
+    
+    journal_event({
+        "type": "turn",
+        "session_id": context.session_id,
+        "timestamp": received_at,
+        "query": query,
+        "intent": intent,
+        "state": detected_state,
+        "region": detected_region,
+        "domain": detected_domain,
+        "response": response_text,
+        "schemes": [scheme['name'] for scheme in schemes]
+    })
+    
+    return response_text, schemes
+
+async def prefetch_search(query: str, context: ConversationContext) -> Optional[List[Tuple[int, Dict]]]:
+    """Score the catalog for a turn that will run a full search, sharing the work between
+    identical concurrent queries. Returns None when the turn won't search the whole catalog."""
+    if not COALESCING_ENABLED or (query.isdigit() and context.last_schemes):
+        return None
+    region, domain = detect_region(query), detect_domain(query)
+    if is_refinement(query, region, domain, context):
+        return None
+    normalized = " ".join(query.lower().split())
+    return await search_flight.run(("chat", normalized, region, domain), score_schemes, normalized, region, domain,
+                                   region_candidates(region))
+
+# Degraded tier: every region x domain list ranked once, so answering is a dict lookup
+DEGRADED_NOTICE = "\n\n_We're busy right now, so this is a quick answer. Ask again in a moment for a full search._"
+DEGRADED_FALLBACK = ("We're handling a lot of requests right now, so only quick answers are available.\n\n"
+                     "Try a state and category, like 'Health schemes in Tamil Nadu', or a scheme name with "
+                     "'eligibility', 'benefits' or 'documents'.")
+
+def build_degraded_rankings() -> Dict[Tuple[Optional[str], Optional[str]], List[Dict]]:
+    """Rank the schemes for every (region, domain) pair, and each alone, as a keyword-free search would.
+    
+    Schemes that are not open yet are ranked too; degraded_list filters by today's status."""
+    rankings = {}
+    for region in [None] + list(REGION_SCHEMES):
+        for domain in [None] + list(DOMAIN_KEYWORDS):
+            if region is None and domain is None:
+                continue
+            scored = score_schemes("", region, domain, region_candidates(region), active_only=False)
+            ranked = top_schemes(scored, limit=len(SCHEMES_DATABASE))
+            if ranked:
+                rankings[(region, domain)] = ranked
+    return rankings
+
+DEGRADED_RANKINGS = build_degraded_rankings()
+degraded_lists: Dict[Tuple, Tuple[int, str, List[Dict]]] = {}  # (region, domain) -> (lifecycle version, reply, schemes)
+
+def degraded_list(region: Optional[str], domain: Optional[str]) -> Tuple[str, List[Dict]]:
+    """The list reply for a region/domain pair, rendered once per lifecycle version"""
+    cached = degraded_lists.get((region, domain))
+    if cached is None or cached[0] != lifecycle.version:
+        schemes = [scheme for scheme in DEGRADED_RANKINGS.get((region, domain), []) if lifecycle.is_active(scheme)][:5]
+        cached = degraded_lists[(region, domain)] = (lifecycle.version, format_scheme_list(schemes), schemes)
+    return cached[1], cached[2]
+
+def degraded_answer(query: str, session_id: Optional[str]) -> Tuple[str, List[Dict]]:
+    """Answer from precomputed lists and fragments only: no fuzzy matching, no session changes"""
+    intent = detect_intent(query)
+    if intent in ('greeting', 'thanks'):
+        return generate_response(query, [], intent, ConversationContext(session_id)), []
+    
+    # Read-only use of the session: a number picks from its last list, a detail question
+    # without a scheme name refers to its current scheme
+    context = sessions.get(session_id) if session_id else None
+    if query.isdigit() and context and context.last_schemes:
+        index = int(query) - 1
+        if 0 <= index < len(context.last_schemes):
+            scheme = context.last_schemes[index]
+            return fragment(scheme, 'selected'), [scheme]
+    
+    if intent in DETAIL_SECTIONS:
+        scheme = lookup_scheme_by_name(query) or (context.current_scheme if context else None)
+        if scheme:
+            return fragment(scheme, intent), [scheme]
+    
+    region, domain = detect_region(query), detect_domain(query)
+    if region or domain:
+        return degraded_list(region, domain)
+    scheme = lookup_scheme_by_name(query)
+    if scheme:
+        return fragment(scheme, 'overview'), [scheme]
+    return DEGRADED_FALLBACK, []
+
+def serve_degraded(query: str, session_id: Optional[str]) -> Tuple[str, List[Dict]]:
+    response_text, schemes = degraded_answer(query, session_id)
+    degradation.degraded_answers += 1
+    journal_event({
+        "type": "turn",
+        "session_id": session_id,
+        "timestamp": datetime.now().isoformat(),
+        "query": query,
+        "intent": detect_intent(query),
+        "response": response_text,
+        "schemes": [scheme['name'] for scheme in schemes],
+        "degraded": True
+    })
+    return response_text + DEGRADED_NOTICE, schemes
+
 @app.post("/chat", response_model=QueryResponse)
-async def chat_endpoint(request: QueryRequest):
+async def chat_endpoint(request: QueryRequest, http_request: Request):
     try:
         query = request.query.strip()
         if not query:
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
-        logger.info(f"Received query: {query}")
+        reason = admission.admit_session(request.session_id, client_address(http_request))
+        if reason:
+            raise HTTPException(status_code=429, detail=reason, headers={"Retry-After": "1"})
+        
+        if degradation.check(admission.in_flight):
+            response_text, schemes = serve_degraded(query, request.session_id)
+            return QueryResponse(
+                response=response_text,
+                schemes=[scheme_model(scheme) for scheme in schemes],
+                session_id=request.session_id or str(uuid.uuid4()),
+                timestamp=datetime.now().isoformat(),
+                degraded=True
+            )
         
         # Get or create session
         context = get_or_create_session(request.session_id)
+        bind_session_token(context, http_request.headers.get(SESSION_TOKEN_HEADER))
         
-        # Add user message to context
-        context.messages.append({
-            "role": "user",
-            "content": query,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Process query
-        detected_state = detect_state(query)
-        detected_domain = detect_domain(query)
-        intent = detect_intent(query)
-        
-        logger.info(f"Detected - State: {detected_state}, Domain: {detected_domain}, Intent: {intent}")
-        
-        # Handle scheme selection from numbered list
-        if query.strip().isdigit() and context.last_schemes:
-            try:
-                scheme_index = int(query.strip()) - 1
-                if 0 <= scheme_index < len(context.last_schemes):
-                    selected_scheme = context.last_schemes[scheme_index]
-                    context.current_scheme = selected_scheme
-                    schemes = [selected_scheme]
-                    response_text = (f"You selected **{selected_scheme['name']}** from {selected_scheme['state']}.\n\n"
-                                   f"**Description:** {selected_scheme['description']}\n\n"
-                                   "What would you like to know about this scheme?\n"
-                                   "• Eligibility criteria\n"
-                                   "• Benefits offered\n"
-                                   "• Application process\n"
-                                   "• Required documents\n"
-                                   "• Official website")
-                else:
-                    schemes = []
-                    response_text = f"Please select a number between 1 and {len(context.last_schemes)}."
-            except ValueError:
-                schemes = find_schemes(query, detected_state, detected_domain)
-                response_text = generate_response(query, schemes, intent, context)
-        else:
-            # Find relevant schemes
-            schemes = find_schemes(query, detected_state, detected_domain)
-            response_text = generate_response(query, schemes, intent, context)
-        
-        # Add assistant response to context
-        context.messages.append({
-            "role": "assistant",
-            "content": response_text,
-            "timestamp": datetime.now().isoformat(),
-            "schemes": schemes
-        })
+        prefetched = await prefetch_search(query, context)
+        response_text, schemes = process_query(query, context, prefetched)
         
         # Convert schemes to Scheme objects
-        scheme_objects = [Scheme(**scheme) for scheme in schemes]
+        scheme_objects = [scheme_model(scheme) for scheme in schemes]
         
         return QueryResponse(
             response=response_text,
@@ -676,37 +1491,114 @@ async def chat_endpoint(request: QueryRequest):
             timestamp=datetime.now().isoformat()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing your request: {str(e)}")
 
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """Chat over one socket: each text frame is a query, each reply a JSON frame shaped like QueryResponse"""
+    client_ip = client_address(websocket)
+    reason = admission.admit_request(client_ip) or admission.admit_session(session_id, client_ip)
+    if reason:
+        await websocket.close(code=1013, reason=reason)
+        return
+    await websocket.accept()
+    
+    # The session is resolved once and stays bound for the lifetime of the connection
+    context = get_or_create_session(session_id)
+    bind_session_token(context, websocket.headers.get(SESSION_TOKEN_HEADER))
+    
+    try:
+        while True:
+            query = (await websocket.receive_text()).strip()
+            if not query:
+                await websocket.send_json({"error": "Query cannot be empty", "session_id": context.session_id})
+                continue
+            
+            reason = admission.admit_message(context.session_id, client_ip)
+            if reason:
+                # retry_after marks the frame as a rate limit, like Retry-After on an HTTP 429
+                await websocket.send_json({"error": reason, "retry_after": 1, "session_id": context.session_id})
+                continue
+            
+            # A message is a chat turn like a POST: it counts as in flight and its latency feeds the mode switch
+            admission.in_flight += 1
+            started = time.perf_counter()
+            try:
+                degraded = degradation.check(admission.in_flight)
+                if degraded:
+                    response_text, schemes = serve_degraded(query, context.session_id)
+                else:
+                    prefetched = await prefetch_search(query, context)
+                    response_text, schemes = process_query(query, context, prefetched)
+            except Exception as e:
+                logger.error(f"Error processing query: {str(e)}")
+                await websocket.send_json({"error": f"Error processing your request: {str(e)}", "session_id": context.session_id})
+                continue
+            finally:
+                admission.in_flight -= 1
+                degradation.observe(time.perf_counter() - started)
+            
+            # Precomputed payloads match the Scheme models /chat returns (id, current status) without validating per turn
+            await websocket.send_json({
+                "response": response_text,
+                "schemes": [scheme_payload(scheme) for scheme in schemes],
+                "session_id": context.session_id,
+                "timestamp": datetime.now().isoformat(),
+                "degraded": degraded
+            })
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket closed for session {context.session_id}")
+
 @app.get("/schemes")
 async def get_all_schemes():
     """Get all available schemes"""
     return {
         "total_schemes": len(SCHEMES_DATABASE),
-        "schemes": [Scheme(**scheme) for scheme in SCHEMES_DATABASE]
+        "schemes": [scheme_model(scheme) for scheme in SCHEMES_DATABASE]
     }
 
+def render_json(content: Dict) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def catalog_response(request: Request, content: Union[Dict, bytes]) -> Response:
+    """Return catalog data (a dict or an already rendered body) tagged with the catalog ETag, or 304 if the client copy is current"""
+    etag = catalog_etag()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    body = content if isinstance(content, bytes) else render_json(content)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/schemes/states")
-async def get_states():
+async def get_states(request: Request):
     """Get all available states"""
     states = list(set(scheme['state'] for scheme in SCHEMES_DATABASE))
-    return {"states": sorted(states)}
+    return catalog_response(request, {"states": sorted(states)})
 
 @app.get("/schemes/domains")
-async def get_domains():
+async def get_domains(request: Request):
     """Get all available domains/categories"""
     domains = list(set(scheme['domain'] for scheme in SCHEMES_DATABASE))
-    return {"domains": sorted(domains)}
+    return catalog_response(request, {"domains": sorted(domains)})
 
-@app.get("/schemes/search")
-async def search_schemes(state: Optional[str] = None, domain: Optional[str] = None, keyword: Optional[str] = None):
-    """Search schemes with filters"""
+@app.get("/schemes/suggest")
+async def suggest_schemes(request: Request, q: str, limit: int = 8):
+    """Typeahead completions for scheme names, acronyms, states and domains"""
+    return catalog_response(request, {"query": q, "suggestions": suggest(q, max(1, min(limit, 20)))})
+
+def search_catalog_body(state: Optional[str], domain: Optional[str], keyword: Optional[str],
+                        include_inactive: bool = False) -> bytes:
+    """Filter the catalog and render the /schemes/search response body"""
     filtered_schemes = SCHEMES_DATABASE.copy()
     
     if state:
-        filtered_schemes = [s for s in filtered_schemes if s['state'].lower() == state.lower()]
+        # Any place name works: a district also returns its state's and central schemes
+        region = resolve_region(state)
+        filtered_schemes = REGION_SCHEMES.get(region, []) if region else []
     
     if domain:
         filtered_schemes = [s for s in filtered_schemes if s['domain'].lower() == domain.lower()]
@@ -720,32 +1612,213 @@ async def search_schemes(state: Optional[str] = None, domain: Optional[str] = No
                keyword_lower in s['domain'].lower()
         ]
     
-    return {
+    if not include_inactive:
+        filtered_schemes = [s for s in filtered_schemes if lifecycle.is_active(s)]
+    
+    return render_json({
         "total_found": len(filtered_schemes),
-        "schemes": [Scheme(**scheme) for scheme in filtered_schemes]
-    }
+        "schemes": [scheme_model(scheme) for scheme in filtered_schemes]
+    })
+
+@app.get("/schemes/search")
+async def search_schemes(request: Request, state: Optional[str] = None, domain: Optional[str] = None, keyword: Optional[str] = None,
+                         include_inactive: bool = False):
+    """Search schemes with filters; schemes not open today are left out unless include_inactive is set"""
+    # Apply any opening or closing due today before the body and its ETag are produced
+    lifecycle.refresh()
+    if not COALESCING_ENABLED:
+        return catalog_response(request, search_catalog_body(state, domain, keyword, include_inactive))
+    
+    # Identical concurrent searches share one filtering pass and one rendered body
+    key = ("search",) + tuple(value.strip().lower() if value else None for value in (state, domain, keyword)) + (include_inactive,)
+    body = await search_flight.run(key, search_catalog_body, *key[1:])
+    return catalog_response(request, body)
+
+@app.get("/schemes/{scheme_id}/related")
+async def get_related_schemes(request: Request, scheme_id: str, limit: int = RELATED_LIMIT):
+    """Schemes related to one scheme: the same category here or in neighbouring states, complementary categories, similar wording"""
+    scheme = SCHEMES_BY_ID.get(scheme_id.lower())
+    if scheme is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scheme id: {scheme_id}")
+    lifecycle.refresh()
+    related = related_schemes(scheme, max(1, min(limit, RELATED_STORED)))
+    return catalog_response(request, {
+        "scheme": scheme_model(scheme),
+        "related": [{"score": round(score, 3), "scheme": scheme_model(other)} for other, score in related]
+    })
 
 @app.delete("/session/{session_id}")
 async def clear_session(session_id: str):
     """Clear a specific session"""
     if session_id in sessions:
         del sessions[session_id]
+        journal_event({"type": "session_cleared", "session_id": session_id, "timestamp": datetime.now().isoformat()})
         return {"message": f"Session {session_id} cleared successfully"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
 
-# ... all your existing backend code ...
+def message_timestamp(message: Dict) -> str:
+    return message["timestamp"]
+
+@app.get("/session/{session_id}/messages")
+async def get_session_messages(session_id: str, http_request: Request, before: Optional[str] = None, limit: int = 20):
+    """Page backwards through a session's history, oldest first within each page"""
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    require_session_token(sessions[session_id], http_request.headers.get(SESSION_TOKEN_HEADER))
+    
+    messages = sessions[session_id].messages
+    end = bisect.bisect_left(messages, before, key=message_timestamp) if before else len(messages)
+    start = max(0, end - max(1, min(limit, 100)))
+    return {
+        "messages": [HistoryMessage(**message) for message in messages[start:end]],
+        "has_more": start > 0
+    }
+
+@app.post("/session/{session_id}/messages")
+async def archive_session_messages(session_id: str, request: HistoryArchiveRequest, http_request: Request):
+    """Store messages the client answered locally so its history window can be trimmed"""
+    reason = admission.admit_session(session_id, client_address(http_request))
+    if reason:
+        raise HTTPException(status_code=429, detail=reason, headers={"Retry-After": "1"})
+    context = get_or_create_session(session_id)
+    token = http_request.headers.get(SESSION_TOKEN_HEADER)
+    bind_session_token(context, token)
+    require_session_token(context, token)
+    for message in request.messages:
+        bisect.insort(context.messages, message.model_dump(), key=message_timestamp)
+        journal_event({"type": "archived_message", "session_id": session_id, **message.model_dump()})
+    cap_session_messages(context)
+    return {"archived": len(request.messages), "total_messages": len(context.messages)}
+
 
 @app.get("/health")
 async def health_check():
+    # Lets the mode recover once load is gone, even if no chat turn arrives to trigger it
+    degradation.check(admission.in_flight)
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "active_sessions": len(sessions),
-        "total_schemes": len(SCHEMES_DATABASE)
+        "total_schemes": len(SCHEMES_DATABASE),
+        "mode": "degraded" if degradation.degraded else "normal",
+        "mode_since_seconds": round(time.monotonic() - degradation.since, 1),
+        "latency_ms": round(degradation.latency_ms, 1),
+        "degraded_answers": degradation.degraded_answers,
+        "in_flight_requests": admission.in_flight,
+        "coalesced_requests": search_flight.shared,
+        "rejected_requests": admission.rejected,
+        "journal_written": journal.written if journal else 0,
+        "journal_dropped": journal.dropped if journal else 0
     }
 
-# FIXED: Correct uvicorn run command
+# Admin endpoints are only served when CHATBOT_ADMIN_TOKEN is set and sent as X-Admin-Token
+ADMIN_TOKEN = os.environ.get("CHATBOT_ADMIN_TOKEN")
+MEMORY_SAMPLE_SESSIONS = 1000  # sessions deep-sized per report; the rest are extrapolated
+last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def memory_indexes() -> List[Tuple[str, object]]:
+    """Long-lived structures built from the catalog, in the order their sizes are reported"""
+    return [
+        ("scheme_models", SCHEME_MODELS),
+        ("scheme_payloads", SCHEME_PAYLOADS),
+        ("scheme_fragments", SCHEME_FRAGMENTS),
+        ("suggest_terms", SUGGEST_TERMS),
+        ("suggest_entries", SUGGEST_ENTRIES),
+        ("name_token_index", NAME_TOKEN_INDEX),
+        ("acronym_index", ACRONYM_INDEX),
+        ("scheme_ids", SCHEMES_BY_ID),
+        ("related_graph", (RELATED_OFFSETS, RELATED_NEIGHBOURS, RELATED_SCORES)),
+        ("region_schemes", REGION_SCHEMES),
+        ("region_ancestors", REGION_ANCESTORS),
+        ("region_alias_index", REGION_ALIAS_INDEX),
+        ("lifecycle", lifecycle),
+        ("degraded_rankings", DEGRADED_RANKINGS),
+        ("degraded_lists", degraded_lists),
+        ("admission_buckets", admission),
+    ]
+
+def memory_report(sample: int = MEMORY_SAMPLE_SESSIONS) -> Dict:
+    """Object counts and deep sizes of the catalog, its indexes and the session store.
+
+    Sizes are marginal: the catalog is sized first, so indexes and sessions that point at
+    catalog entries are only charged for what they add on top."""
+    seen = set()
+    catalog_bytes = deep_size(SCHEMES_DATABASE, seen)
+    indexes = {name: deep_size(structure, seen) for name, structure in memory_indexes()}
+
+    contexts = list(sessions.values())
+    sampled = contexts[::max(1, len(contexts) // max(1, sample))]
+    session_sizes = [deep_size(context, seen) for context in sampled]
+    per_session = sum(session_sizes) / len(session_sizes) if session_sizes else 0
+    message_counts = [len(context.messages) for context in contexts]
+
+    return {
+        "process_rss_bytes": process_rss(),
+        "catalog": {"schemes": len(SCHEMES_DATABASE), "bytes": catalog_bytes},
+        "indexes": indexes,
+        "sessions": {
+            "count": len(contexts),
+            "max_sessions": MAX_SESSIONS,
+            "sampled": len(sampled),
+            "live_contexts": sum(1 for obj in gc.get_objects() if isinstance(obj, ConversationContext)),
+            "messages": sum(message_counts),
+            "max_messages_per_session": max(message_counts, default=0),
+            "bytes_per_session": round(per_session),
+            "max_session_bytes": max(session_sizes, default=0),
+            "estimated_bytes": round(per_session * len(contexts)) + sys.getsizeof(sessions)
+                               + sum(sys.getsizeof(session_id) for session_id in sessions),
+            "projected_bytes_per_100k": round(per_session * 100000),
+        },
+    }
+
+@app.get("/admin/memory")
+async def memory_usage(request: Request, sample: int = MEMORY_SAMPLE_SESSIONS):
+    """Memory report for this worker process"""
+    require_admin(request)
+    return memory_report(max(1, sample))
+
+@app.post("/admin/memory/tracemalloc")
+async def start_allocation_tracing(request: Request, frames: int = 1):
+    """Start tracing allocations; snapshots can be taken once it is running"""
+    require_admin(request)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, min(frames, 25)))
+    return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+@app.get("/admin/memory/tracemalloc")
+async def allocation_snapshot(request: Request, top: int = 20):
+    """Top allocation sites, with growth since the previous snapshot"""
+    global last_snapshot
+    require_admin(request)
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="Allocation tracing is not running")
+    snapshot = tracemalloc.take_snapshot()
+    previous, last_snapshot = last_snapshot, snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "top": top_allocations(snapshot, limit=top),
+        "growth": top_allocations(snapshot, previous, limit=top) if previous else []
+    }
+
+@app.delete("/admin/memory/tracemalloc")
+async def stop_allocation_tracing(request: Request):
+    """Stop tracing allocations and drop the stored snapshot"""
+    global last_snapshot
+    require_admin(request)
+    tracemalloc.stop()
+    last_snapshot = None
+    return {"tracing": False}
+
+# FIXED: Correct uvicorn run command (development; use serve.py for multi-worker production serving)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("backend:app", host="127.0.0.1", port=8001, reload=True)
\ No newline at end of file
@@ -0,0 +1,87 @@
+# bench_coalescing.py - Latency of bursts of identical queries with request coalescing on and off
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+from bench_workers import wait_until_healthy
+
+# Popular queries that arrive in bursts, e.g. right after a scheme is in the news
+HOT_CHAT_QUERIES = ["Health schemes in Tamil Nadu", "education scholarship", "farmer schemes in Punjab"]
+HOT_SEARCHES = [{"domain": "Health"}, {"state": "Kerala"}, {"keyword": "scholarship"}]
+
+def burst(base_url: str, size: int, round_no: int) -> List[float]:
+    """Fire `size` identical requests at once, released together by a barrier"""
+    barrier = threading.Barrier(size)
+    query = HOT_CHAT_QUERIES[round_no % len(HOT_CHAT_QUERIES)]
+    params = HOT_SEARCHES[round_no % len(HOT_SEARCHES)]
+
+    def one(i: int) -> float:
+        http = requests.Session()
+        barrier.wait()
+        start = time.perf_counter()
+        if i % 2:
+            response = http.get(f"{base_url}/schemes/search", params=params, timeout=30)
+        else:
+            response = http.post(f"{base_url}/chat", json={"query": query, "session_id": f"burst_{uuid.uuid4().hex}"},
+                                 timeout=30)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=size) as pool:
+        return list(pool.map(one, range(size)))
+
+def measure(coalescing: bool, port: int, bursts: int, size: int) -> Dict[str, float]:
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "CHATBOT_ADMISSION_CONTROL": "off", "CHATBOT_DEGRADED_MODE": "off", "CHATBOT_JOURNAL_DIR": "off",
+             "CHATBOT_COALESCING": "on" if coalescing else "off"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_healthy(base_url)
+        burst(base_url, size, 0)  # warm-up
+        start = time.perf_counter()
+        latencies = sorted(latency for i in range(bursts) for latency in burst(base_url, size, i))
+        elapsed = time.perf_counter() - start
+        coalesced = requests.get(f"{base_url}/health", timeout=5).json().get("coalesced_requests", 0)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": quantiles[49] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "burst_ms": elapsed / bursts * 1000,
+        "coalesced": coalesced,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare identical-query bursts with and without request coalescing")
+    parser.add_argument("--bursts", type=int, default=30, help="Bursts per run")
+    parser.add_argument("--size", type=int, default=50, help="Concurrent identical requests per burst")
+    parser.add_argument("--port", type=int, default=8201, help="Port used for the benchmark server")
+    args = parser.parse_args()
+
+    print(f"{args.bursts} bursts of {args.size} requests (half /chat, half /schemes/search)")
+    print(f"{'coalescing':<12}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'burst ms':>10}{'coalesced':>11}")
+    for coalescing in (False, True):
+        stats = measure(coalescing, args.port, args.bursts, args.size)
+        print(f"{'on' if coalescing else 'off':<12}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['burst_ms']:>10.1f}{stats['coalesced']:>11}")
+
+if __name__ == "__main__":
+    main()
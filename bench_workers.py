@@ -0,0 +1,97 @@
+# bench_workers.py - Throughput of serve.py as the number of workers grows
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import uuid
+from typing import Optional
+
+import requests
+
+from load_test import CONVERSATION
+
+def wait_until_healthy(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+def client_loop(args):
+    """One load-generating process: several conversations over a keep-alive connection"""
+    base_url, duration, sessions_per_client = args
+    http = requests.Session()
+    session_ids = [f"bench_{uuid.uuid4().hex}" for _ in range(sessions_per_client)]
+    deadline = time.monotonic() + duration
+    completed = 0
+    while time.monotonic() < deadline:
+        response = http.post(
+            f"{base_url}/chat",
+            json={
+                "query": CONVERSATION[completed % len(CONVERSATION)],
+                "session_id": session_ids[completed % sessions_per_client]
+            },
+            timeout=30
+        )
+        response.raise_for_status()
+        completed += 1
+    return completed
+
+def measure(workers: int, port: int, clients: int, duration: float, sessions_per_client: int,
+            routers: Optional[int] = None) -> float:
+    """Start serve.py with `workers` workers and return sustained requests per second"""
+    base_url = f"http://127.0.0.1:{port}"
+    router_args = ["--routers", str(routers)] if routers else []
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port),
+         "--worker-base-port", str(port + 100)] + router_args,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "CHATBOT_ADMISSION_CONTROL": "off", "CHATBOT_DEGRADED_MODE": "off"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_healthy(base_url)
+        with multiprocessing.Pool(clients) as pool:
+            client_loop((base_url, 1.0, 1))  # warm-up
+            start = time.monotonic()
+            completed = sum(pool.map(client_loop, [(base_url, duration, sessions_per_client)] * clients))
+            elapsed = time.monotonic() - start
+        return completed / elapsed
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Measure serve.py throughput scaling with worker count")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cores} & set(range(1, cores + 1))),
+                        help="Worker counts to measure")
+    parser.add_argument("--clients", type=int, default=cores * 4, help="Load-generating processes")
+    parser.add_argument("--sessions-per-client", type=int, default=8, help="Conversations interleaved by each client")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count")
+    parser.add_argument("--port", type=int, default=8101, help="Router port used for the benchmark")
+    parser.add_argument("--routers", type=int, default=None, help="Router processes (default: serve.py's own default)")
+    args = parser.parse_args()
+
+    print(f"{cores} cores, {args.clients} client processes, {args.duration:.0f}s per run")
+    if max(args.workers) > cores:
+        # Extra workers only compete for the same cores, so these rows measure overhead, not scaling
+        print(f"Note: runs with more than {cores} workers cannot show a speedup on this machine")
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>10}{'efficiency':>12}")
+    baseline = None
+    for workers in args.workers:
+        throughput = measure(workers, args.port, args.clients, args.duration, args.sessions_per_client, args.routers)
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        print(f"{workers:>8}{throughput:>10.0f}{speedup:>10.2f}{speedup * args.workers[0] / workers:>11.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# evaluate.py - Retrieval quality and latency regression harness
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import backend
+from regions import REGION_ALIAS_INDEX, REGION_ANCESTORS, REGION_LEVEL, state_of
+
+# Quality metrics where a drop counts as a regression
+QUALITY_METRICS = ["precision@1", "precision@k", "recall@k", "mrr", "state_accuracy", "domain_accuracy", "intent_accuracy"]
+LATENCY_METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+# Committed quality baseline for the default case set, checked on every run
+DEFAULT_BASELINE = "eval_baseline.json"
+
+# Detail questions about one scheme and the intent each should resolve to
+DETAIL_TEMPLATES = [
+    ("{name} eligibility", "eligibility"),
+    ("who is eligible for {name}", "eligibility"),
+    ("{name} benefits", "benefits"),
+    ("how to apply for {name}", "application"),
+    ("documents required for {name}", "documents"),
+    ("official website of {name}", "website"),
+]
+# Browse-style questions: (template, names a place?, intent)
+LIST_TEMPLATES = [
+    ("{domain} schemes in {place}", True, "list"),
+    ("show {keyword} schemes in {place}", True, "list"),
+    ("{keyword} schemes {alias}", True, "list"),
+    ("list {domain} schemes", False, "list"),
+]
+
+def load_cases(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def short_name(name: str) -> str:
+    """The way people usually type a scheme name: acronym if it has one, else without the bracketed part"""
+    acronyms = re.findall(r"\(([A-Z]{2,})\)", name)
+    return acronyms[0] if acronyms else re.sub(r"\s*\(.*?\)", "", name)
+
+def generate_cases(count: int, seed: int = 0) -> List[Dict]:
+    """Labelled synthetic queries built from catalog fields, alias tables and templates"""
+    rng = random.Random(seed)
+    # Schemes not open today are never retrieved, so they are neither asked for nor expected
+    schemes = [scheme for scheme in backend.SCHEMES_DATABASE if backend.lifecycle.is_active(scheme)]
+    aliases: Dict[str, List[str]] = {}
+    for alias, region in REGION_ALIAS_INDEX.items():
+        aliases.setdefault(region, []).append(alias)
+
+    def relevant(region: Optional[str], domain: str) -> List[str]:
+        """Schemes in the domain that apply in the region (its own, its ancestors' and central ones)"""
+        return [scheme['name'] for scheme in schemes if scheme['domain'] == domain
+                and (region is None or backend.scheme_region(scheme) in REGION_ANCESTORS[region])]
+
+    cases = []
+    while len(cases) < count:
+        scheme = rng.choice(schemes)
+        region, domain = backend.scheme_region(scheme), scheme['domain']
+        # Central schemes can't be asked for by place, only by name
+        if rng.random() < 0.5 or REGION_LEVEL[region] == "country":
+            template, intent = rng.choice(DETAIL_TEMPLATES)
+            query = template.format(name=rng.choice([scheme['name'], short_name(scheme['name'])]))
+            cases.append({"query": query, "state": None, "domain": None, "intent": intent,
+                          "relevant": [scheme['name']], "synthetic": True})
+        else:
+            template, names_state, intent = rng.choice(LIST_TEMPLATES)
+            query = template.format(
+                domain=domain.lower(),
+                place=region,
+                keyword=rng.choice(backend.DOMAIN_KEYWORDS[domain]),
+                alias=rng.choice(aliases[region]),
+            )
+            named_region = region if names_state else None
+            cases.append({"query": query, "state": state_of(named_region), "domain": domain, "intent": intent,
+                          "relevant": relevant(named_region, domain), "synthetic": True})
+    return cases
+
+def answer_schemes(query: str, region: Optional[str], domain: Optional[str], intent: str) -> List[Dict]:
+    """The schemes a new chat session answers the query with, taking the same path as generate_response"""
+    if intent in ('greeting', 'thanks'):
+        return []
+    # Detail questions about a named scheme are answered by name lookup, not by search
+    if intent in backend.DETAIL_SECTIONS:
+        scheme = backend.lookup_scheme_by_name(query)
+        if scheme:
+            return [scheme]
+    return backend.find_schemes(query, region, domain)
+
+def run_case(case: Dict, k: int, repeat: int = 1) -> Dict:
+    """Push one query through detection and retrieval, timing the whole pipeline (fastest of `repeat` runs)"""
+    query = case["query"]
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        region = backend.detect_region(query)
+        state = state_of(region)
+        domain = backend.detect_domain(query)
+        intent = backend.detect_intent(query)
+        retrieved = [scheme['name'] for scheme in answer_schemes(query, region, domain, intent)][:k]
+        timings.append(time.perf_counter() - start)
+    # The fastest run is the least disturbed by other load on the machine
+    latency = min(timings)
+
+    relevant = set(case.get("relevant") or [])
+    ranks = [i for i, name in enumerate(retrieved, 1) if name in relevant]
+    return {
+        "query": query,
+        "latency_ms": latency * 1000,
+        "state_ok": state == case.get("state"),
+        "domain_ok": domain == case.get("domain"),
+        "intent_ok": intent == case.get("intent"),
+        "precision@1": float(bool(retrieved) and retrieved[0] in relevant) if relevant else None,
+        "precision@k": len(ranks) / k if relevant else None,
+        "recall@k": len(ranks) / len(relevant) if relevant else None,
+        "reciprocal_rank": 1 / ranks[0] if ranks else 0.0,
+        "retrieved": retrieved,
+        "detected": {"state": state, "region": region, "domain": domain, "intent": intent},
+    }
+
+def mean(values: List[Optional[float]]) -> float:
+    values = [v for v in values if v is not None]
+    return statistics.fmean(values) if values else 0.0
+
+def summarize(results: List[Dict]) -> Dict:
+    latencies = sorted(r["latency_ms"] for r in results)
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "cases": len(results),
+        "precision@1": mean([r["precision@1"] for r in results]),
+        "precision@k": mean([r["precision@k"] for r in results]),
+        "recall@k": mean([r["recall@k"] for r in results]),
+        "mrr": mean([r["reciprocal_rank"] for r in results if r["recall@k"] is not None]),
+        "state_accuracy": mean([float(r["state_ok"]) for r in results]),
+        "domain_accuracy": mean([float(r["domain_ok"]) for r in results]),
+        "intent_accuracy": mean([float(r["intent_ok"]) for r in results]),
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": quantiles[49],
+        "p95_ms": quantiles[94],
+        "p99_ms": quantiles[98],
+        "max_ms": latencies[-1],
+    }
+
+def expected_status(scheme: Dict, today: str) -> str:
+    """A scheme's status on `today` worked out directly from its catalog fields"""
+    status = scheme.get('status', 'active')
+    if status == 'closed' or (status == 'upcoming' and not scheme.get('open_date')):
+        return status
+    if scheme.get('open_date') and today < scheme['open_date']:
+        return 'upcoming'
+    if scheme.get('close_date') and today > scheme['close_date']:
+        return 'closed'
+    return 'active'
+
+def check_lifecycle() -> List[str]:
+    """Replay the catalog's dated transitions and a probe scheme's opening and closing on a fresh
+    LifecycleIndex, checking statuses, the version and the catalog ETag follow the dates"""
+    probe = {"name": "Lifecycle probe", "open_date": "2999-01-01", "close_date": "2999-01-31"}
+    index = backend.LifecycleIndex(backend.SCHEMES_DATABASE + [probe])
+    failures = []
+    saved, backend.lifecycle = backend.lifecycle, index
+    try:
+        etag = backend.catalog_etag()  # applies every transition due today
+        today = datetime.date.today().isoformat()
+        for scheme in backend.SCHEMES_DATABASE:
+            if index.status(scheme) != expected_status(scheme, today):
+                failures.append(f"{scheme['name']} is {index.status(scheme)} on {today}")
+        for day, expected in [("2998-12-31", "upcoming"), ("2999-01-01", "active"),
+                              ("2999-01-31", "active"), ("2999-02-01", "closed")]:
+            version = index.version
+            changed = index.refresh(day)
+            if index.status(probe) != expected:
+                failures.append(f"probe is {index.status(probe)} on {day}, expected {expected}")
+            if changed != (index.version != version):
+                failures.append(f"refresh on {day} returned {changed} but the version went {version} -> {index.version}")
+            if (backend.catalog_etag() != etag) != changed:
+                failures.append(f"catalog ETag {'did not change' if changed else 'changed'} on {day}")
+            etag = backend.catalog_etag()
+    finally:
+        backend.lifecycle = saved
+    return failures
+
+def find_regressions(summary: Dict, baseline: Dict, max_quality_drop: float, max_latency_increase: float) -> List[str]:
+    regressions = []
+    for metric in QUALITY_METRICS:
+        if metric in baseline and summary[metric] < baseline[metric] - max_quality_drop:
+            regressions.append(f"{metric} dropped from {baseline[metric]:.4f} to {summary[metric]:.4f}")
+    for metric in LATENCY_METRICS:
+        if metric in baseline and summary[metric] > baseline[metric] * (1 + max_latency_increase):
+            regressions.append(f"{metric} rose from {baseline[metric]:.3f} to {summary[metric]:.3f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency against labelled queries")
+    parser.add_argument("--golden", default="golden_queries.jsonl", help="Hand-labelled query set (JSON lines)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add this many generated queries")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic generation")
+    parser.add_argument("-k", type=int, default=5, help="Cut-off for precision@k and recall@k")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Summary JSON to compare against ('' to skip); regressions exit with status 1, "
+                             "a missing baseline or one recorded for other cases with status 2")
+    parser.add_argument("--save-baseline", help="Write this run's summary as the new baseline")
+    parser.add_argument("--quality-only", action="store_true",
+                        help="Leave latency out of the saved baseline, for baselines shared across machines")
+    parser.add_argument("--max-quality-drop", type=float, default=0.01, help="Allowed absolute drop in quality metrics")
+    parser.add_argument("--max-latency-increase", type=float, default=0.25, help="Allowed relative rise in latency percentiles")
+    parser.add_argument("--repeat", type=int, default=20, help="Time each query this many times and keep the fastest")
+    parser.add_argument("--show-failures", type=int, default=10, help="Print up to this many missed queries")
+    args = parser.parse_args()
+
+    logging.getLogger("backend").setLevel(logging.WARNING)
+
+    cases = load_cases(args.golden) if args.golden else []
+    if args.synthetic:
+        cases += generate_cases(args.synthetic, args.seed)
+    if not cases:
+        parser.error("no cases to evaluate")
+
+    # A short untimed warm-up so first-call costs stay out of the latency numbers
+    for case in cases[:50]:
+        run_case(case, args.k)
+    results = [run_case(case, args.k, args.repeat) for case in cases]
+    summary = summarize(results)
+    # What was measured, so a baseline is only ever compared with a run over the same cases
+    summary["run"] = {"golden": args.golden, "synthetic": args.synthetic, "seed": args.seed, "k": args.k,
+                      "repeat": args.repeat}
+
+    print(f"{summary['cases']} cases, k={args.k}")
+    for metric in QUALITY_METRICS:
+        print(f"  {metric:<16}{summary[metric]:.4f}")
+    print("  latency ms      " + "  ".join(f"{m[:-3]}={summary[m]:.3f}" for m in ["mean_ms"] + LATENCY_METRICS + ["max_ms"]))
+
+    misses = [r for r in results if r["reciprocal_rank"] == 0.0 and r["recall@k"] is not None]
+    for result in misses[:args.show_failures]:
+        print(f"  miss: {result['query']!r} -> {result['retrieved'][:3]} {result['detected']}")
+
+    # Dated schemes open and close on their own; check that path on every run
+    lifecycle_failures = check_lifecycle()
+    for failure in lifecycle_failures:
+        print(f"LIFECYCLE: {failure}")
+    if lifecycle_failures:
+        sys.exit(1)
+
+    if args.save_baseline:
+        saved = {metric: value for metric, value in summary.items()
+                 if not (args.quality_only and metric.endswith("_ms"))}
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2)
+            f.write("\n")
+        return
+
+    if args.baseline:
+        # A check that silently didn't happen must not look like a pass
+        if not os.path.exists(args.baseline):
+            print(f"Baseline {args.baseline} not found; record one with --save-baseline or pass --baseline ''")
+            sys.exit(2)
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("run") != summary["run"]:
+            print(f"Baseline {args.baseline} was recorded for {baseline.get('run')}, not {summary['run']}; not compared")
+            sys.exit(2)
+        regressions = find_regressions(summary, baseline, args.max_quality_drop, args.max_latency_increase)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 # frontend.py - Government Schemes Chatbot Frontend (Updated)
 import streamlit as st
 import requests
-import time
+import json
+import secrets
+import uuid
 from datetime import datetime
 
+try:
+    from websockets.sync.client import connect as websocket_connect
+    from websockets.exceptions import WebSocketException
+except ImportError:  # Chat falls back to plain HTTP without the websockets client
+    websocket_connect = None
+
 # Page Configuration
 st.set_page_config(
     page_title="Government Schemes Assistant",
@@ -14,6 +22,27 @@ st.set_page_config(
 
 # API Configuration
 API_BASE_URL = "http://localhost:8001"
+WS_BASE_URL = API_BASE_URL.replace("http", "ws", 1)
+
+# Browse data is static catalog content, so it is cached locally and revalidated by ETag
+CATALOG_CACHE_TTL = 300  # seconds
+ALL_STATES = "All states"
+
+# Only the most recent turns are kept and rendered; older history lives in the backend session
+HISTORY_WINDOW_TURNS = 10
+HISTORY_PAGE_SIZE = 20
+
+SUGGESTION_LIMIT = 6
+RELATED_LIMIT = 3  # "you may also like" suggestions under a browsed scheme
+SUGGESTION_ICONS = {"scheme": "📄", "state": "📍", "domain": "🗂️"}
+
+DETAIL_FIELDS = [
+    ("eligibility", "Eligibility for {name}", ['eligibility', 'eligible', 'qualify', 'criteria', 'who can']),
+    ("benefits", "Benefits of {name}", ['benefit', 'benefits', 'what do i get', 'advantages']),
+    ("application_process", "How to apply for {name}", ['apply', 'application', 'process', 'how to', 'registration']),
+    ("official_website", "Official website for {name}", ['website', 'link', 'official', 'portal', 'online']),
+    ("required_documents", "Required documents for {name}", ['document', 'documents', 'required', 'papers', 'proof']),
+]
 
 # Clean CSS
 st.markdown("""
@@ -107,18 +136,35 @@ def initialize_session():
                           "• 'Education scholarships in Kerala'\n"
                           "• 'Women welfare schemes in Karnataka'\n\n"
                           "What would you like to know?"),
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
+                "local": True
             }
         ]
     
     if "session_id" not in st.session_state:
-        st.session_state.session_id = f"session_{int(time.time())}"
+        st.session_state.session_id = str(uuid.uuid4())
+        # Secret the backend binds to this session; history reads and writes must send it
+        st.session_state.session_token = secrets.token_urlsafe(32)
     
     if "processing" not in st.session_state:
         st.session_state.processing = False
     
     if "input_key" not in st.session_state:
         st.session_state.input_key = 0
+    
+    # Schemes listed by the last local browse, and the one picked from that list
+    if "browse_schemes" not in st.session_state:
+        st.session_state.browse_schemes = []
+    
+    if "browse_selected" not in st.session_state:
+        st.session_state.browse_selected = None
+    
+    # Pages fetched back from the backend by "Load earlier messages"
+    if "earlier_messages" not in st.session_state:
+        st.session_state.earlier_messages = []
+    
+    if "has_earlier" not in st.session_state:
+        st.session_state.has_earlier = False
 
 def check_backend_connection():
     """Check if backend is running"""
@@ -128,8 +174,65 @@ def check_backend_connection():
     except:
         return False
 
+def client_headers() -> dict:
+    """Send the session secret, and name the end user's address to the backend, whose
+    per-address rate limits would otherwise see every user of this frontend as one client"""
+    headers = {"X-Session-Token": st.session_state.session_token}
+    address = st.context.ip_address
+    # None when unknown, and a mock rather than a string under streamlit.testing
+    if isinstance(address, str) and address:
+        headers["X-Forwarded-For"] = address
+    return headers
+
+def get_chat_socket():
+    """Open, or reuse, this browser session's chat WebSocket"""
+    socket = st.session_state.get("chat_socket")
+    if socket is None:
+        # Entered by hand because the socket outlives this rerun; it is closed on failure
+        socket = websocket_connect(
+            f"{WS_BASE_URL}/ws/chat?session_id={st.session_state.session_id}",
+            additional_headers=client_headers(),
+            open_timeout=5
+        ).__enter__()
+        st.session_state.chat_socket = socket
+    return socket
+
+def drop_chat_socket():
+    socket = st.session_state.get("chat_socket")
+    if socket is not None:
+        socket.close()
+    st.session_state.chat_socket = None
+
+def send_message_over_socket(message: str):
+    """Send message over the persistent WebSocket, reconnecting once if it dropped.
+    
+    Returns None only when the message never left (so it is safe to send over HTTP); once
+    sent it is never resent, since the backend may already be answering it"""
+    for _ in range(2):
+        try:
+            socket = get_chat_socket()
+            socket.send(message)
+        except (OSError, TimeoutError, WebSocketException):
+            drop_chat_socket()
+            continue
+        try:
+            response_data = json.loads(socket.recv(timeout=30))
+        except (OSError, TimeoutError, WebSocketException):
+            drop_chat_socket()
+            return {"error": "no_reply"}
+        # Rate-limited frames get the same slow-down notice as an HTTP 429
+        if "error" in response_data and "retry_after" in response_data:
+            return {"error": "rate_limited"}
+        return response_data
+    return None
+
 def send_message_to_backend(message: str):
     """Send message to backend API"""
+    if websocket_connect is not None:
+        response_data = send_message_over_socket(message)
+        if response_data is not None:
+            return response_data
+    
     try:
         response = requests.post(
             f"{API_BASE_URL}/chat",
@@ -137,11 +240,14 @@ def send_message_to_backend(message: str):
                 "query": message,
                 "session_id": st.session_state.session_id
             },
+            headers=client_headers(),
             timeout=30
         )
         
         if response.status_code == 200:
             return response.json()
+        elif response.status_code == 429:
+            return {"error": "rate_limited"}
         else:
             return None
     except requests.exceptions.ConnectionError:
@@ -149,28 +255,306 @@ def send_message_to_backend(message: str):
     except Exception as e:
         return {"error": str(e)}
 
+@st.cache_resource
+def _catalog_etag_store():
+    """Last good body and ETag per catalog URL, shared across reruns and sessions"""
+    return {}
+
+def fetch_catalog(path: str, params: dict = None):
+    """GET a catalog endpoint, revalidating any stored copy with If-None-Match"""
+    params = {k: v for k, v in (params or {}).items() if v}
+    store = _catalog_etag_store()
+    key = (path, tuple(sorted(params.items())))
+    cached = store.get(key)
+    headers = {"If-None-Match": cached["etag"]} if cached and cached["etag"] else {}
+    
+    try:
+        response = requests.get(f"{API_BASE_URL}{path}", params=params, headers=headers, timeout=5)
+    except requests.exceptions.RequestException:
+        if cached:
+            return cached["data"]
+        raise
+    
+    if response.status_code == 304 and cached:
+        return cached["data"]
+    response.raise_for_status()
+    data = response.json()
+    store[key] = {"etag": response.headers.get("ETag"), "data": data}
+    return data
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def get_catalog_states():
+    """States offered by the catalog"""
+    return fetch_catalog("/schemes/states")["states"]
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def get_catalog_domains():
+    """Domains/categories offered by the catalog"""
+    return fetch_catalog("/schemes/domains")["domains"]
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def search_catalog(state: str = None, domain: str = None):
+    """Faceted scheme search, one cached entry per state/domain combination"""
+    return fetch_catalog("/schemes/search", {"state": state, "domain": domain})["schemes"]
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def fetch_suggestions(prefix: str):
+    """Typeahead completions for a partly typed scheme, state or category name"""
+    response = requests.get(
+        f"{API_BASE_URL}/schemes/suggest",
+        params={"q": prefix, "limit": SUGGESTION_LIMIT},
+        timeout=2
+    )
+    response.raise_for_status()
+    return response.json()["suggestions"]
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def fetch_related(scheme_id: str):
+    """Schemes related to a browsed one, from the backend's precomputed similarity graph"""
+    return fetch_catalog(f"/schemes/{scheme_id}/related", {"limit": RELATED_LIMIT})["related"]
+
+def format_scheme_list(schemes: list) -> str:
+    """Render a browse result the same way the backend renders list answers"""
+    if not schemes:
+        return ("I couldn't find any schemes matching your query.\n\n"
+                "Try being more specific:\n"
+                "• 'Health schemes in Tamil Nadu'\n"
+                "• 'Education scholarships in Kerala'\n"
+                "• 'Women welfare schemes in Karnataka'")
+    
+    schemes_text = "\n".join(f"{i}. {scheme['name']} ({scheme['state']})" for i, scheme in enumerate(schemes, 1))
+    if len(schemes) == 1:
+        return (f"I found 1 scheme matching your query:\n\n"
+               f"{schemes_text}\n\n"
+               "Type the number or scheme name to get more details.")
+    return (f"I found {len(schemes)} schemes matching your query:\n\n"
+           f"{schemes_text}\n\n"
+           "Which scheme would you like to know about? (Type the number or scheme name)")
+
+def format_scheme_detail(scheme: dict) -> str:
+    """Render the overview shown when a scheme is picked from a browse list"""
+    detail = (f"You selected **{scheme['name']}** from {scheme['state']}.\n\n"
+              f"**Description:** {scheme['description']}\n\n"
+              "What would you like to know about this scheme?\n"
+              "• Eligibility criteria\n"
+              "• Benefits offered\n"
+              "• Application process\n"
+              "• Required documents\n"
+              "• Official website")
+    # Suggestions are a nice-to-have; the overview stands on its own without them
+    try:
+        related = fetch_related(scheme["id"]) if scheme.get("id") else []
+    except requests.exceptions.RequestException:
+        related = []
+    if related:
+        lines = "\n".join(f"• {item['scheme']['name']} ({item['scheme']['state']})" for item in related)
+        detail += f"\n\n**You may also like:**\n{lines}"
+    return detail
+
+def answer_from_browse(user_input: str):
+    """Answer follow-ups to a local browse list without calling the backend, or return None"""
+    schemes = st.session_state.browse_schemes
+    if not schemes:
+        return None
+    
+    text = user_input.strip().lower()
+    if text.isdigit():
+        scheme_index = int(text) - 1
+        if 0 <= scheme_index < len(schemes):
+            st.session_state.browse_selected = schemes[scheme_index]
+            return format_scheme_detail(schemes[scheme_index])
+        return f"Please select a number between 1 and {len(schemes)}."
+    
+    # Short field questions ("eligibility", "how to apply") about the picked scheme
+    scheme = st.session_state.browse_selected
+    if scheme and len(text.split()) <= 4:
+        for field, title, keywords in DETAIL_FIELDS:
+            if any(keyword in text for keyword in keywords):
+                return f"**{title.format(name=scheme['name'])}:**\n\n{scheme[field]}"
+    
+    return None
+
+def clear_browse_state():
+    """Forget the local browse list once the conversation moves to the backend"""
+    st.session_state.browse_schemes = []
+    st.session_state.browse_selected = None
+
+def append_exchange(user_content: str, assistant_content: str):
+    """Add a locally answered user message and its answer to the chat history"""
+    st.session_state.messages.append({
+        "role": "user",
+        "content": user_content,
+        "timestamp": datetime.now().isoformat(),
+        "local": True
+    })
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": assistant_content,
+        "timestamp": datetime.now().isoformat(),
+        "local": True
+    })
+    trim_history()
+
+def trim_history():
+    """Keep the last HISTORY_WINDOW_TURNS turns in session state, archiving local-only messages"""
+    messages = st.session_state.messages
+    overflow = len(messages) - HISTORY_WINDOW_TURNS * 2
+    if overflow <= 0:
+        return
+    
+    # Cut on a user message so the window never starts halfway through a turn
+    while overflow < len(messages) and messages[overflow]["role"] != "user":
+        overflow += 1
+    
+    # Messages the backend never saw must be archived before they are dropped
+    local_messages = [
+        {"role": m["role"], "content": m["content"], "timestamp": m["timestamp"]}
+        for m in messages[:overflow] if m.get("local")
+    ]
+    if local_messages:
+        try:
+            response = requests.post(
+                f"{API_BASE_URL}/session/{st.session_state.session_id}/messages",
+                json={"messages": local_messages},
+                headers=client_headers(),
+                timeout=5
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return
+    
+    # Loaded pages are dropped with the trimmed messages so session state stays bounded;
+    # all of it is on the backend and can be loaded again
+    st.session_state.earlier_messages = []
+    st.session_state.has_earlier = True
+    del messages[:overflow]
+
+def load_earlier_messages():
+    """Fetch the page of history just before the oldest message on screen"""
+    shown = st.session_state.earlier_messages or st.session_state.messages
+    try:
+        response = requests.get(
+            f"{API_BASE_URL}/session/{st.session_state.session_id}/messages",
+            params={"before": shown[0]["timestamp"], "limit": HISTORY_PAGE_SIZE},
+            headers=client_headers(),
+            timeout=5
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        st.warning("Couldn't load earlier messages. Please try again.")
+        return
+    
+    data = response.json()
+    st.session_state.earlier_messages = data["messages"] + st.session_state.earlier_messages
+    st.session_state.has_earlier = data["has_more"]
+
+def handle_browse(domain: str = None, state: str = None):
+    """Serve a category/state browse from the cached catalog"""
+    if st.session_state.processing:
+        return
+    
+    label = f"{domain or 'All'} schemes" + (f" in {state}" if state else "")
+    try:
+        schemes = search_catalog(state, domain)
+    except requests.exceptions.RequestException:
+        append_exchange(label, "🔴 **Connection Lost**\n\nThe backend server has stopped running. Please:\n1. Start the backend: `python backend.py`\n2. Refresh this page")
+        clear_browse_state()
+    else:
+        append_exchange(label, format_scheme_list(schemes))
+        st.session_state.browse_schemes = schemes
+        st.session_state.browse_selected = None
+    
+    st.session_state.input_key += 1
+    st.rerun()
+
+# st.cache_data rather than lru_cache: the script module is re-created on every rerun
+@st.cache_data(max_entries=1024, show_spinner=False)
+def render_message_html(role: str, content: str) -> str:
+    """Build the HTML block for one chat message"""
+    if role == "user":
+        return f'<div class="user-message"><strong>You:</strong><br>{content}</div>'
+    return f'<div class="assistant-message"><strong>Assistant:</strong><br>{content}</div>'
+
+def handle_suggestion(suggestion: dict):
+    """Open a picked completion: browse a state or category, or show the scheme itself"""
+    if suggestion["type"] == "state":
+        handle_browse(state=suggestion["text"])
+        return
+    if suggestion["type"] == "domain":
+        handle_browse(domain=suggestion["text"])
+        return
+    
+    try:
+        matches = [scheme for scheme in search_catalog() if scheme["name"] == suggestion["text"]]
+    except requests.exceptions.RequestException:
+        matches = []
+    if not matches:
+        handle_user_input(suggestion["text"])
+        return
+    
+    append_exchange(suggestion["text"], format_scheme_detail(matches[0]))
+    st.session_state.browse_schemes = matches
+    st.session_state.browse_selected = matches[0]
+    st.session_state.input_key += 1
+    st.rerun()
+
+def display_suggestions():
+    """Completion buttons for whatever is typed in the finder box"""
+    prefix = st.text_input(
+        "Find a scheme",
+        placeholder="Find a scheme, state or category, e.g. 'Gruha'",
+        label_visibility="collapsed",
+        key=f"suggest_input_{st.session_state.input_key}"
+    ).strip()
+    if len(prefix) < 2:
+        return
+    
+    try:
+        suggestions = fetch_suggestions(prefix)
+    except requests.exceptions.RequestException:
+        return
+    if not suggestions:
+        st.caption("No matching schemes, states or categories.")
+        return
+    
+    columns = st.columns(3)
+    for i, suggestion in enumerate(suggestions):
+        with columns[i % 3]:
+            label = f"{SUGGESTION_ICONS[suggestion['type']]} {suggestion['text']}"
+            if st.button(label, use_container_width=True, key=f"suggestion_{i}"):
+                handle_suggestion(suggestion)
+
 def display_chat_messages():
-    """Display all chat messages"""
-    for message in st.session_state.messages:
-        role = message["role"]
-        content = message["content"]
-        
-        if role == "user":
-            st.markdown(f'<div class="user-message"><strong>You:</strong><br>{content}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="assistant-message"><strong>Assistant:</strong><br>{content}</div>', unsafe_allow_html=True)
+    """Display the loaded history window"""
+    if st.session_state.has_earlier:
+        if st.button("⬆ Load earlier messages", key="load_earlier_btn"):
+            load_earlier_messages()
+            st.rerun()
+    
+    for message in st.session_state.earlier_messages + st.session_state.messages:
+        st.markdown(render_message_html(message["role"], message["content"]), unsafe_allow_html=True)
 
 def handle_user_input(user_input: str):
     """Handle user input and get response from backend"""
     if st.session_state.processing or not user_input.strip():
         return
     
+    # Follow-ups to a local browse list are answered from the cached catalog
+    local_answer = answer_from_browse(user_input)
+    if local_answer is not None:
+        append_exchange(user_input, local_answer)
+        st.session_state.input_key += 1
+        st.rerun()
+        return
+    clear_browse_state()
+    
     # Check backend connection first
     if not check_backend_connection():
         st.session_state.messages.append({
             "role": "assistant",
             "content": "🔴 **Backend Server Not Running**\n\nPlease start the backend server first:\n```bash\npython backend.py\n```\nThen refresh this page.",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "local": True
         })
         st.session_state.input_key += 1
         st.rerun()
@@ -179,18 +563,27 @@ def handle_user_input(user_input: str):
     st.session_state.processing = True
     
     # Add user message to chat
-    st.session_state.messages.append({
+    user_message = {
         "role": "user",
         "content": user_input,
         "timestamp": datetime.now().isoformat()
-    })
+    }
+    st.session_state.messages.append(user_message)
     
     # Get response from backend
     with st.spinner("Searching schemes..."):
         response_data = send_message_to_backend(user_input)
         
-        if response_data and "error" not in response_data:
+        # Only exchanges the backend answered in full are already in its session history;
+        # quick answers served while it is overloaded are not recorded there
+        answered = bool(response_data) and "error" not in response_data
+        stored = answered and not response_data.get("degraded")
+        user_message["local"] = not stored
+        
+        if answered:
             assistant_response = response_data["response"]
+        elif response_data and response_data.get("error") == "rate_limited":
+            assistant_response = "⏳ You're sending messages a little too quickly. Please wait a moment and try again."
         elif response_data and response_data.get("error") == "connection_failed":
             assistant_response = "🔴 **Connection Lost**\n\nThe backend server has stopped running. Please:\n1. Start the backend: `python backend.py`\n2. Refresh this page"
         else:
@@ -200,9 +593,11 @@ def handle_user_input(user_input: str):
         st.session_state.messages.append({
             "role": "assistant",
             "content": assistant_response,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "local": not stored
         })
     
+    trim_history()
     st.session_state.processing = False
     st.session_state.input_key += 1
     st.rerun()
@@ -254,25 +649,46 @@ def main():
     # Display chat messages
     display_chat_messages()
     
-    # Quick action buttons
+    # Quick action buttons, served from the cached catalog
     st.markdown("### Quick Options:")
+    try:
+        states = get_catalog_states()
+        domains = get_catalog_domains()
+    except requests.exceptions.RequestException:
+        states, domains = [], []
+    
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        browse_state = st.selectbox("State", [ALL_STATES] + states, label_visibility="collapsed", key="browse_state")
+    with col2:
+        browse_domain = st.selectbox("Category", domains, label_visibility="collapsed", key="browse_domain")
+    with col3:
+        browse_clicked = st.button("Browse", use_container_width=True, key="browse_btn")
+    
+    selected_state = None if browse_state == ALL_STATES else browse_state
+    if browse_clicked and browse_domain:
+        handle_browse(browse_domain, selected_state)
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         if st.button("🏥 Health", use_container_width=True, key="health_btn"):
-            handle_user_input("Health schemes")
+            handle_browse("Health", selected_state)
     
     with col2:
         if st.button("🎓 Education", use_container_width=True, key="edu_btn"):
-            handle_user_input("Education schemes")
+            handle_browse("Education", selected_state)
     
     with col3:
         if st.button("👩 Women", use_container_width=True, key="women_btn"):
-            handle_user_input("Women welfare schemes")
+            handle_browse("Women Welfare", selected_state)
     
     with col4:
         if st.button("🌾 Agriculture", use_container_width=True, key="agri_btn"):
-            handle_user_input("Agriculture schemes")
+            handle_browse("Agriculture", selected_state)
+    
+    # Typeahead finder (Streamlit re-runs on Enter or when the box loses focus)
+    display_suggestions()
     
     # Input area
     st.markdown("---")
@@ -0,0 +1,245 @@
+# journal.py - Append-only, compressed conversation journal
+import argparse
+import glob
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+try:
+    import zstandard
+except ImportError:  # Segments fall back to gzip when zstandard isn't installed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SUFFIX = ".part"
+
+# Errors raised when the last frame of a segment was cut short by a crash
+TRUNCATION_ERRORS = (EOFError, OSError) + ((zstandard.ZstdError,) if zstandard else ())
+
+def segment_extension() -> str:
+    return ".jsonl.zst" if zstandard else ".jsonl.gz"
+
+def compress(data: bytes) -> bytes:
+    """Compress one batch as a self-contained frame; frames concatenate into a valid stream"""
+    if zstandard:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+def process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Exists, owned by another user
+        return True
+    return True
+
+def recover_segments(directory: str) -> List[str]:
+    """Finalize `*.part` segments left behind by processes that are no longer running.
+
+    The writer's pid is part of the segment name; a segment whose writer is gone was cut
+    off by a crash and will never be closed, so it is renamed to make readers pick it up
+    (a truncated last frame is skipped when it is read)."""
+    recovered = []
+    for path in glob.glob(os.path.join(directory, "journal-*" + ACTIVE_SUFFIX)):
+        try:
+            pid = int(os.path.basename(path).split("-")[2])
+        except (IndexError, ValueError):
+            continue
+        if pid == os.getpid() or process_running(pid):
+            continue
+        final_path = path[:-len(ACTIVE_SUFFIX)]
+        try:
+            os.replace(path, final_path)
+        except OSError as e:
+            logger.warning(f"Could not finalize abandoned journal segment {path}: {e}")
+            continue
+        recovered.append(final_path)
+    if recovered:
+        logger.warning(f"Finalized {len(recovered)} journal segments abandoned by crashed processes")
+    return recovered
+
+class ConversationJournal:
+    """Buffers conversation events in memory and lets a background thread write them out.
+
+    Each batch becomes one compressed frame appended to the current segment and is
+    fsynced once, so a crash loses at most the batch in flight. Segments rotate at
+    `segment_bytes` and are renamed from `*.part` once closed (or, after a crash, when the
+    next writer starts). `record` never blocks: if the writer falls behind and the queue
+    fills up, events are dropped and counted.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, batch_size: int = 1000,
+                 flush_interval: float = 1.0, max_queue: int = 100000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.written = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_path = None
+        self._segment_seq = 0
+
+    def record(self, event: Dict):
+        """Queue an event for writing; safe to call from the request path"""
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        # Threads don't survive fork, so every worker process starts its own writer and segments
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            recover_segments(self.directory)
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._segment = None
+            self._segment_seq = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="conversation-journal", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Flush queued events and close the current segment"""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+        self._pid = None
+
+    def _run(self):
+        while True:
+            batch: List[Dict] = []
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            if batch:
+                self._write_batch(batch)
+
+            if stopping:
+                try:
+                    self._close_segment()
+                except Exception as e:
+                    logger.error(f"Journal segment close failed: {e}")
+                return
+
+    def _write_batch(self, batch: List[Dict]):
+        # Any failure here must not kill the writer thread, or every later event would be lost silently
+        try:
+            if self._segment is None:
+                self._open_segment()
+            lines = "".join(json.dumps(event, ensure_ascii=False, default=str) + "\n" for event in batch)
+            self._segment.write(compress(lines.encode("utf-8")))
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error(f"Journal write failed, dropped {len(batch)} events: {e}")
+            self._abandon_segment()
+            return
+        self.written += len(batch)
+
+        if self._segment.tell() >= self.segment_bytes:
+            try:
+                self._close_segment()
+            except Exception as e:
+                # The batch is already on disk; the .part file is picked up by recover_segments later
+                logger.error(f"Journal segment rotation failed: {e}")
+
+    def _open_segment(self):
+        self._segment_seq += 1
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        name = f"journal-{stamp}-{self._pid}-{self._segment_seq:05d}{segment_extension()}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._segment = open(self._segment_path + ACTIVE_SUFFIX, "ab")
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        segment, self._segment = self._segment, None
+        segment.close()
+        os.replace(self._segment_path + ACTIVE_SUFFIX, self._segment_path)
+
+    def _abandon_segment(self):
+        # Start a fresh segment on the next batch rather than appending after a failed frame;
+        # readers already stop cleanly at a truncated final frame
+        if self._segment is None:
+            return
+        segment, self._segment = self._segment, None
+        try:
+            segment.close()
+            os.replace(self._segment_path + ACTIVE_SUFFIX, self._segment_path)
+        except Exception as e:
+            logger.error(f"Journal could not close failed segment: {e}")
+
+def list_segments(directory: str, include_active: bool = False) -> List[str]:
+    """Segment paths in write order (timestamp, then process and sequence number)"""
+    patterns = ["journal-*.jsonl.zst", "journal-*.jsonl.gz"]
+    if include_active:
+        patterns += [pattern + ACTIVE_SUFFIX for pattern in patterns]
+    paths = [path for pattern in patterns for path in glob.glob(os.path.join(directory, pattern))]
+    return sorted(paths, key=os.path.basename)
+
+def read_segment(path: str) -> Iterator[Dict]:
+    """Stream events from one segment; a truncated final frame (crash mid-write) ends the stream"""
+    name = path[:-len(ACTIVE_SUFFIX)] if path.endswith(ACTIVE_SUFFIX) else path
+    with open(path, "rb") as raw:
+        if name.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is required to read {path}")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        else:
+            stream = gzip.GzipFile(fileobj=raw)
+        try:
+            for line in io.TextIOWrapper(stream, encoding="utf-8"):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+        except TRUNCATION_ERRORS as e:
+            logger.warning(f"Stopped reading truncated segment {path}: {e}")
+
+def read_journal(directory: str, include_active: bool = False) -> Iterator[Dict]:
+    """Stream every event in the journal, segment by segment"""
+    for path in list_segments(directory, include_active):
+        yield from read_segment(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Print journal events as JSON lines")
+    parser.add_argument("directory", nargs="?", default="journal", help="Journal directory")
+    parser.add_argument("--include-active", action="store_true", help="Also read segments still being written")
+    args = parser.parse_args()
+
+    for event in read_journal(args.directory, args.include_active):
+        print(json.dumps(event, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# load_test.py - Per-message latency of the HTTP /chat path vs the /ws/chat WebSocket
+# Start the backend with CHATBOT_ADMISSION_CONTROL=off so rate limits don't reject the load,
+# and CHATBOT_DEGRADED_MODE=off so overload doesn't switch it to precomputed quick answers.
+import argparse
+import json
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import requests
+from websockets.sync.client import connect as websocket_connect
+
+# A short multi-turn conversation replayed on every client
+CONVERSATION = [
+    "Health schemes in Tamil Nadu",
+    "1",
+    "eligibility",
+    "Education scholarships in Kerala",
+    "1",
+    "how to apply",
+    "Women welfare schemes in Karnataka",
+    "2",
+]
+
+def run_http(base_url: str, messages: int, keep_alive: bool) -> List[float]:
+    """One client over HTTP POST /chat, returning per-message latencies in seconds"""
+    session_id = f"load_{uuid.uuid4().hex}"
+    http = requests.Session() if keep_alive else requests
+    latencies = []
+    for i in range(messages):
+        start = time.perf_counter()
+        response = http.post(
+            f"{base_url}/chat",
+            json={"query": CONVERSATION[i % len(CONVERSATION)], "session_id": session_id},
+            timeout=30
+        )
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def run_websocket(base_url: str, messages: int) -> List[float]:
+    """One client over a single /ws/chat connection, returning per-message latencies in seconds"""
+    ws_url = base_url.replace("http", "ws", 1)
+    latencies = []
+    with websocket_connect(f"{ws_url}/ws/chat?session_id=load_{uuid.uuid4().hex}") as socket:
+        for i in range(messages):
+            start = time.perf_counter()
+            socket.send(CONVERSATION[i % len(CONVERSATION)])
+            reply = json.loads(socket.recv(timeout=30))
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def measure(client: Callable[[], List[float]], concurrency: int) -> Dict[str, float]:
+    """Run `concurrency` clients in parallel and summarise their latencies"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for result in results for latency in result)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "messages": len(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "msg_per_s": len(latencies) / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-message overhead of HTTP and WebSocket chat")
+    parser.add_argument("--url", default="http://localhost:8001", help="Backend base URL")
+    parser.add_argument("--messages", type=int, default=500, help="Messages sent by each client")
+    parser.add_argument("--concurrency", type=int, default=1, help="Parallel clients per transport")
+    args = parser.parse_args()
+
+    transports = {
+        "http (new connection)": lambda: run_http(args.url, args.messages, keep_alive=False),
+        "http (keep-alive)": lambda: run_http(args.url, args.messages, keep_alive=True),
+        "websocket": lambda: run_websocket(args.url, args.messages),
+    }
+
+    # Warm up both paths so first-connection costs don't skew the numbers
+    run_http(args.url, len(CONVERSATION), keep_alive=True)
+    run_websocket(args.url, len(CONVERSATION))
+
+    degraded_before = requests.get(f"{args.url}/health", timeout=5).json().get("degraded_answers", 0)
+    results = {name: measure(client, args.concurrency) for name, client in transports.items()}
+    degraded = requests.get(f"{args.url}/health", timeout=5).json().get("degraded_answers", 0) - degraded_before
+    baseline = results["websocket"]["mean_ms"]
+
+    print(f"{'transport':<24}{'msgs':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'msg/s':>10}{'overhead ms':>13}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['messages']:>7}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['msg_per_s']:>10.0f}"
+              f"{stats['mean_ms'] - baseline:>13.2f}")
+    if degraded:
+        print(f"Warning: {degraded} replies were degraded quick answers; restart the backend with CHATBOT_DEGRADED_MODE=off")
+
+if __name__ == "__main__":
+    main()
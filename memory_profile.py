@@ -0,0 +1,84 @@
+# memory_profile.py - Object sizing helpers for memory reports and capacity planning
+import sys
+import tracemalloc
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Dict, List, Optional, Set
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Leaves: counted themselves but never walked into
+ATOMIC_TYPES = (str, bytes, bytearray, int, float, bool, type(None))
+# Shared program structure, never part of a data structure's cost
+SKIPPED_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+def deep_size(obj, seen: Optional[Set[int]] = None) -> int:
+    """Bytes reachable from `obj`, each object counted once.
+
+    Objects whose ids are already in `seen` are skipped and every object visited is added
+    to it, so sizing the shared data first and reusing `seen` gives marginal costs."""
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, ATOMIC_TYPES):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            attributes = getattr(current, "__dict__", None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+def process_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (peak RSS where /proc isn't available)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+# Allocations made by tracemalloc and the import machinery themselves
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def top_allocations(snapshot: tracemalloc.Snapshot, previous: Optional[tracemalloc.Snapshot] = None,
+                    limit: int = 20) -> List[Dict]:
+    """Largest allocation sites in a snapshot, or the largest growth since `previous`"""
+    snapshot = snapshot.filter_traces(SNAPSHOT_FILTERS)
+    if previous is not None:
+        stats = snapshot.compare_to(previous.filter_traces(SNAPSHOT_FILTERS), "lineno")
+        return [{"location": str(stat.traceback), "size_kb": round(stat.size / 1024, 1),
+                 "size_diff_kb": round(stat.size_diff / 1024, 1), "count": stat.count, "count_diff": stat.count_diff}
+                for stat in stats[:limit]]
+    return [{"location": str(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]]
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+        size /= 1024
@@ -0,0 +1,345 @@
+# regions.py - Region hierarchy (country -> state -> district -> city) and place-name detection
+import re
+from typing import Dict, List, Optional, Tuple
+
+COUNTRY = "India"
+LEVELS = ["country", "state", "district", "city"]
+
+# Words that scope a query to schemes of the whole country; the country's own name is left
+# out on purpose, since "schemes in India" asks for everything rather than central schemes only.
+# "centre" only counts as part of a phrase, as on its own it is usually a place ("health centre")
+COUNTRY_ALIASES = ['central', 'central government', 'centre government', 'union government', 'all india',
+                   'pan india', 'nationwide']
+
+# State -> (aliases, {district: (aliases, {city: aliases})}). Names are matched whole-word,
+# so short codes like "tn" never fire inside other words
+REGION_TREE = {
+    'Tamil Nadu': (['tamil nadu', 'tn', 'tamilnadu'], {
+        'Ariyalur': ([], {}),
+        'Chengalpattu': (['chengalpet'], {'Tambaram': []}),
+        'Chennai': (['madras'], {}),
+        'Coimbatore': (['kovai'], {'Pollachi': []}),
+        'Cuddalore': ([], {}),
+        'Dharmapuri': ([], {}),
+        'Dindigul': ([], {}),
+        'Erode': ([], {}),
+        'Kallakurichi': ([], {}),
+        'Kanchipuram': (['kancheepuram'], {}),
+        'Kanyakumari': (['kanniyakumari'], {'Nagercoil': []}),
+        'Karur': ([], {}),
+        'Krishnagiri': ([], {'Hosur': []}),
+        'Madurai': ([], {}),
+        'Mayiladuthurai': ([], {}),
+        'Nagapattinam': ([], {}),
+        'Namakkal': ([], {}),
+        'Nilgiris': (['the nilgiris'], {'Ooty': ['udhagamandalam']}),
+        'Perambalur': ([], {}),
+        'Pudukkottai': ([], {}),
+        'Ramanathapuram': (['ramnad'], {'Rameswaram': []}),
+        'Ranipet': ([], {}),
+        'Salem': ([], {}),
+        'Sivaganga': (['sivagangai'], {'Karaikudi': []}),
+        'Tenkasi': ([], {}),
+        'Thanjavur': (['tanjore'], {'Kumbakonam': []}),
+        'Theni': ([], {}),
+        'Thoothukudi': (['tuticorin'], {}),
+        'Tiruchirappalli': (['trichy', 'tiruchi'], {}),
+        'Tirunelveli': (['nellai'], {}),
+        'Tirupathur': ([], {}),
+        'Tiruppur': (['tirupur'], {}),
+        'Tiruvallur': (['thiruvallur'], {'Avadi': []}),
+        'Tiruvannamalai': (['thiruvannamalai'], {}),
+        'Tiruvarur': (['thiruvarur'], {}),
+        'Vellore': ([], {}),
+        'Viluppuram': (['villupuram'], {}),
+        'Virudhunagar': ([], {'Sivakasi': []}),
+    }),
+    'Kerala': (['kerala', 'kl'], {
+        'Alappuzha': (['alleppey'], {}),
+        'Ernakulam': ([], {'Kochi': ['cochin']}),
+        'Idukki': ([], {'Munnar': []}),
+        'Kannur': (['cannanore'], {}),
+        'Kasaragod': (['kasargod'], {}),
+        'Kollam': (['quilon'], {}),
+        'Kottayam': ([], {}),
+        'Kozhikode': (['calicut'], {}),
+        'Malappuram': ([], {'Manjeri': []}),
+        'Palakkad': (['palghat'], {}),
+        'Pathanamthitta': ([], {}),
+        'Thiruvananthapuram': (['trivandrum'], {}),
+        'Thrissur': (['trichur'], {}),
+        'Wayanad': ([], {}),
+    }),
+    'Karnataka': (['karnataka', 'kt', 'ka'], {
+        'Bagalkote': (['bagalkot'], {}),
+        'Ballari': (['bellary'], {}),
+        'Belagavi': (['belgaum'], {}),
+        'Bengaluru Rural': (['bangalore rural'], {}),
+        'Bengaluru Urban': (['bangalore urban'], {'Bengaluru': ['bangalore']}),
+        'Bidar': ([], {}),
+        'Chamarajanagar': (['chamarajanagara'], {}),
+        'Chikkaballapur': (['chikkaballapura'], {}),
+        'Chikkamagaluru': (['chikmagalur'], {}),
+        'Chitradurga': ([], {}),
+        'Dakshina Kannada': ([], {'Mangaluru': ['mangalore']}),
+        'Davanagere': (['davangere'], {}),
+        'Dharwad': ([], {'Hubballi': ['hubli']}),
+        'Gadag': ([], {}),
+        'Hassan': ([], {}),
+        'Haveri': ([], {}),
+        'Kalaburagi': (['gulbarga'], {}),
+        'Kodagu': (['coorg'], {'Madikeri': []}),
+        'Kolar': ([], {}),
+        'Koppal': ([], {}),
+        'Mandya': ([], {}),
+        'Mysuru': (['mysore'], {}),
+        'Raichur': ([], {}),
+        'Ramanagara': ([], {}),
+        'Shivamogga': (['shimoga'], {}),
+        'Tumakuru': (['tumkur'], {}),
+        'Udupi': ([], {'Manipal': []}),
+        'Uttara Kannada': ([], {'Karwar': []}),
+        'Vijayanagara': ([], {'Hosapete': ['hospet']}),
+        'Vijayapura': (['bijapur'], {}),
+        'Yadgir': ([], {}),
+    }),
+    'Andhra Pradesh': (['andhra pradesh', 'ap', 'andhra'], {
+        'Alluri Sitharama Raju': ([], {'Paderu': []}),
+        'Anakapalli': ([], {}),
+        'Anantapur': (['ananthapuramu', 'anantapuramu'], {}),
+        'Annamayya': ([], {'Rayachoti': []}),
+        'Bapatla': ([], {'Chirala': []}),
+        'Chittoor': ([], {}),
+        'Dr. B.R. Ambedkar Konaseema': (['konaseema', 'ambedkar konaseema'], {'Amalapuram': []}),
+        'East Godavari': ([], {'Rajahmundry': ['rajamahendravaram']}),
+        'Eluru': ([], {}),
+        'Guntur': ([], {}),
+        'Kakinada': ([], {}),
+        'Krishna': ([], {'Machilipatnam': []}),
+        'Kurnool': ([], {}),
+        'Nandyal': ([], {}),
+        # "NTR" alone would catch the NTR Vaidya Seva scheme name
+        'NTR District': ([], {'Vijayawada': ['bezawada']}),
+        'Palnadu': ([], {'Narasaraopet': []}),
+        'Parvathipuram Manyam': ([], {}),
+        'Prakasam': ([], {'Ongole': []}),
+        'Sri Potti Sriramulu Nellore': (['nellore'], {}),
+        'Sri Sathya Sai': ([], {'Puttaparthi': []}),
+        'Srikakulam': ([], {}),
+        'Tirupati': (['tirupathi'], {}),
+        'Visakhapatnam': (['vizag', 'vishakhapatnam'], {}),
+        'Vizianagaram': ([], {}),
+        'West Godavari': ([], {'Bhimavaram': []}),
+        'YSR Kadapa': (['kadapa', 'cuddapah', 'ysr district'], {}),
+    }),
+    'Telangana': (['telangana', 'ts', 'tg'], {
+        'Adilabad': ([], {}),
+        'Bhadradri Kothagudem': (['kothagudem'], {}),
+        'Hanumakonda': (['hanamkonda'], {}),
+        'Hyderabad': (['hyd'], {'Secunderabad': []}),
+        'Jagtial': (['jagitial'], {}),
+        'Jangaon': (['jangaon'], {}),
+        'Jayashankar Bhupalpally': (['bhupalpally'], {}),
+        'Jogulamba Gadwal': (['gadwal'], {}),
+        'Kamareddy': ([], {}),
+        'Karimnagar': ([], {}),
+        'Khammam': ([], {}),
+        'Komaram Bheem Asifabad': (['asifabad'], {}),
+        'Mahabubabad': ([], {}),
+        'Mahabubnagar': (['mahbubnagar'], {}),
+        'Mancherial': ([], {}),
+        'Medak': ([], {}),
+        'Medchal-Malkajgiri': (['medchal', 'malkajgiri'], {}),
+        'Mulugu': ([], {}),
+        'Nagarkurnool': ([], {}),
+        'Nalgonda': ([], {}),
+        'Narayanpet': ([], {}),
+        'Nirmal': ([], {}),
+        'Nizamabad': ([], {}),
+        'Peddapalli': ([], {'Ramagundam': []}),
+        'Rajanna Sircilla': (['sircilla'], {}),
+        'Rangareddy': (['ranga reddy'], {}),
+        'Sangareddy': ([], {}),
+        'Siddipet': ([], {}),
+        'Suryapet': ([], {}),
+        'Vikarabad': ([], {}),
+        'Wanaparthy': ([], {}),
+        'Warangal': ([], {}),
+        'Yadadri Bhuvanagiri': (['bhongir', 'yadadri'], {}),
+    }),
+    'Maharashtra': (['maharashtra', 'mh'], {
+        'Ahmednagar': (['ahilyanagar'], {}),
+        'Akola': ([], {}),
+        'Amravati': ([], {}),
+        'Beed': ([], {}),
+        'Bhandara': ([], {}),
+        'Buldhana': ([], {}),
+        'Chandrapur': ([], {}),
+        'Chhatrapati Sambhajinagar': (['aurangabad', 'sambhajinagar'], {}),
+        'Dharashiv': (['osmanabad'], {}),
+        'Dhule': ([], {}),
+        'Gadchiroli': ([], {}),
+        'Gondia': ([], {}),
+        'Hingoli': ([], {}),
+        'Jalgaon': ([], {}),
+        'Jalna': ([], {}),
+        'Kolhapur': ([], {}),
+        'Latur': ([], {}),
+        'Mumbai City': (['mumbai', 'bombay'], {}),
+        'Mumbai Suburban': ([], {'Andheri': [], 'Borivali': []}),
+        'Nagpur': ([], {}),
+        'Nanded': ([], {}),
+        'Nandurbar': ([], {}),
+        'Nashik': (['nasik'], {}),
+        'Palghar': ([], {'Vasai-Virar': ['vasai', 'virar']}),
+        'Parbhani': ([], {}),
+        'Pune': (['poona'], {'Pimpri-Chinchwad': ['pimpri', 'chinchwad']}),
+        'Raigad': ([], {'Panvel': []}),
+        'Ratnagiri': ([], {}),
+        'Sangli': ([], {}),
+        'Satara': ([], {}),
+        'Sindhudurg': ([], {}),
+        'Solapur': (['sholapur'], {}),
+        'Thane': ([], {'Navi Mumbai': [], 'Kalyan-Dombivli': ['kalyan', 'dombivli']}),
+        'Wardha': ([], {}),
+        'Washim': ([], {}),
+        'Yavatmal': ([], {}),
+    }),
+    'Puducherry': (['puducherry', 'pondicherry', 'py', 'pondy'], {
+        'Karaikal': ([], {}),
+        'Mahe': ([], {}),
+        'Yanam': ([], {}),
+    }),
+    # States and union territories without district-level schemes in the catalog yet
+    'Andaman and Nicobar Islands': (['andaman', 'nicobar', 'andaman and nicobar'], {}),
+    'Arunachal Pradesh': ([], {}),
+    'Assam': ([], {}),
+    'Bihar': ([], {}),
+    'Chandigarh': ([], {}),
+    'Chhattisgarh': (['chattisgarh'], {}),
+    'Dadra and Nagar Haveli and Daman and Diu': (['dadra and nagar haveli', 'daman and diu', 'daman', 'diu'], {}),
+    'Delhi': (['new delhi', 'nct of delhi'], {}),
+    'Goa': ([], {}),
+    'Gujarat': ([], {}),
+    'Haryana': ([], {}),
+    'Himachal Pradesh': (['himachal'], {}),
+    'Jammu and Kashmir': (['jammu', 'kashmir', 'j&k'], {}),
+    'Jharkhand': ([], {}),
+    'Ladakh': ([], {}),
+    'Lakshadweep': ([], {}),
+    'Madhya Pradesh': ([], {}),
+    'Manipur': ([], {}),
+    'Meghalaya': ([], {}),
+    'Mizoram': ([], {}),
+    'Nagaland': ([], {}),
+    'Odisha': (['orissa'], {}),
+    'Punjab': ([], {}),
+    'Rajasthan': ([], {}),
+    'Sikkim': ([], {}),
+    'Tripura': ([], {}),
+    'Uttar Pradesh': ([], {}),
+    'Uttarakhand': (['uttaranchal'], {}),
+    'West Bengal': (['bengal'], {}),
+}
+
+def normalize_place(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def build_region_index() -> Tuple[Dict[str, Optional[str]], Dict[str, str], Dict[str, Tuple[str, ...]], Dict[str, str]]:
+    """Flatten REGION_TREE into parent links, levels, ancestor chains and a phrase -> region alias index"""
+    parents: Dict[str, Optional[str]] = {COUNTRY: None}
+    levels: Dict[str, str] = {COUNTRY: "country"}
+    aliases: Dict[str, str] = {normalize_place(alias): COUNTRY for alias in COUNTRY_ALIASES}
+
+    def add(name: str, level: str, parent: str, names: List[str]):
+        if name in parents:
+            raise ValueError(f"Region {name!r} appears twice in REGION_TREE")
+        parents[name] = parent
+        levels[name] = level
+        for alias in [name] + names:
+            phrase = normalize_place(alias)
+            if aliases.get(phrase, name) != name:
+                raise ValueError(f"Alias {alias!r} is ambiguous between {aliases[phrase]!r} and {name!r}")
+            aliases[phrase] = name
+
+    for state, (state_aliases, districts) in REGION_TREE.items():
+        add(state, "state", COUNTRY, state_aliases)
+        for district, (district_aliases, cities) in districts.items():
+            add(district, "district", state, district_aliases)
+            for city, city_aliases in cities.items():
+                add(city, "city", district, city_aliases)
+
+    # Each region with its ancestors, most specific first, so matching a scheme is a tuple lookup
+    ancestors: Dict[str, Tuple[str, ...]] = {}
+    for region in parents:
+        chain = []
+        node = region
+        while node is not None:
+            chain.append(node)
+            node = parents[node]
+        ancestors[region] = tuple(chain)
+    return parents, levels, ancestors, aliases
+
+REGION_PARENT, REGION_LEVEL, REGION_ANCESTORS, REGION_ALIAS_INDEX = build_region_index()
+MAX_ALIAS_WORDS = max(len(phrase.split()) for phrase in REGION_ALIAS_INDEX)
+
+def detect_region(text: str) -> Optional[str]:
+    """The most specific place named in the text (the earliest one on ties).
+
+    Word n-grams are looked up in the alias index, longest first, so the cost depends on
+    the length of the text and not on how many place names are known."""
+    words = normalize_place(text).split()
+    best, best_depth = None, 0
+    i = 0
+    while i < len(words):
+        for n in range(min(MAX_ALIAS_WORDS, len(words) - i), 0, -1):
+            region = REGION_ALIAS_INDEX.get(" ".join(words[i:i + n]))
+            if region:
+                depth = len(REGION_ANCESTORS[region])
+                if depth > best_depth:
+                    best, best_depth = region, depth
+                i += n
+                break
+        else:
+            i += 1
+    return best
+
+def resolve_region(name: Optional[str]) -> Optional[str]:
+    """Canonical region for a region name or alias, or None if it isn't a known place"""
+    if not name:
+        return None
+    if name in REGION_ANCESTORS:
+        return name
+    return REGION_ALIAS_INDEX.get(normalize_place(name))
+
+def state_of(region: Optional[str]) -> Optional[str]:
+    """The state a region belongs to; None for the country itself or an unknown region"""
+    for node in REGION_ANCESTORS.get(region, ()):
+        if REGION_LEVEL[node] == "state":
+            return node
+    return None
+
+# Land borders of the states with detailed coverage, one entry per pair (Puducherry's
+# enclaves make it a neighbour of Tamil Nadu, Kerala and Andhra Pradesh)
+STATE_BORDERS = [
+    ('Tamil Nadu', 'Kerala'), ('Tamil Nadu', 'Karnataka'), ('Tamil Nadu', 'Andhra Pradesh'), ('Tamil Nadu', 'Puducherry'),
+    ('Kerala', 'Karnataka'), ('Kerala', 'Puducherry'),
+    ('Karnataka', 'Andhra Pradesh'), ('Karnataka', 'Telangana'), ('Karnataka', 'Maharashtra'), ('Karnataka', 'Goa'),
+    ('Andhra Pradesh', 'Telangana'), ('Andhra Pradesh', 'Puducherry'), ('Andhra Pradesh', 'Odisha'),
+    ('Andhra Pradesh', 'Chhattisgarh'),
+    ('Telangana', 'Maharashtra'), ('Telangana', 'Chhattisgarh'),
+    ('Maharashtra', 'Goa'), ('Maharashtra', 'Gujarat'), ('Maharashtra', 'Madhya Pradesh'), ('Maharashtra', 'Chhattisgarh'),
+    ('Maharashtra', 'Dadra and Nagar Haveli and Daman and Diu'),
+]
+
+def build_state_neighbours() -> Dict[str, frozenset]:
+    neighbours: Dict[str, set] = {}
+    for a, b in STATE_BORDERS:
+        for state in (a, b):
+            if REGION_LEVEL.get(state) != "state":
+                raise ValueError(f"Border {a!r}/{b!r} names {state!r}, which is not a state in REGION_TREE")
+        neighbours.setdefault(a, set()).add(b)
+        neighbours.setdefault(b, set()).add(a)
+    return {state: frozenset(names) for state, names in neighbours.items()}
+
+STATE_NEIGHBOURS = build_state_neighbours()
@@ -0,0 +1,353 @@
+# serve.py - Production serving mode: N forked backend workers behind session-affinity routers
+import argparse
+import asyncio
+import bisect
+import gc
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import uvicorn
+
+# Importing the backend loads the catalog (and anything built from it) once, in the master.
+# Workers are forked afterwards and share those pages copy-on-write.
+import backend
+
+logger = logging.getLogger("serve")
+
+# Limits are per worker: every worker keeps its own sessions, admission buckets and in-flight
+# count, so with N workers the server as a whole holds up to N * MAX_SESSIONS sessions and
+# N * MAX_CONCURRENT_REQUESTS in-flight POSTs. A client's conversations hash to different
+# workers, so its per-IP and new-session rates can reach up to N times the configured rate.
+# Per-session rates are exact, since a session always lands on the same worker.
+
+CLIENT_HEADER_LIMIT = 64 * 1024
+MAX_REQUEST_BODY = 1024 * 1024  # larger bodies get 413 without being read
+UPSTREAM_IDLE_LIMIT = 4.0  # seconds; under uvicorn's 5s keep-alive, so pooled connections aren't closed mid-request
+REPLAYABLE_METHODS = ("GET", "HEAD", "OPTIONS")  # safe to resend when a pooled connection turns out stale
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+class HashRing:
+    """Consistent hash ring mapping session ids onto worker ports"""
+
+    def __init__(self, nodes: List[int], replicas: int = 64):
+        ring = sorted((hash_key(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [key for key, _ in ring]
+        self._nodes = [node for _, node in ring]
+
+    def node_for(self, key: str) -> int:
+        index = bisect.bisect(self._keys, hash_key(key)) % len(self._keys)
+        return self._nodes[index]
+
+def run_worker(host: str, port: int):
+    """Worker entry point: serve the already-imported app on a private port"""
+    config = uvicorn.Config(backend.app, host=host, port=port, log_level="warning", access_log=False)
+    uvicorn.Server(config).run()
+
+def start_worker(context, host: str, port: int):
+    process = context.Process(target=run_worker, args=(host, port), name=f"backend-worker-{port}", daemon=True)
+    process.start()
+    return process
+
+def wait_for_port(host: str, port: int, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Worker on port {port} did not start within {timeout}s")
+
+def parse_head(head: bytes) -> Tuple[str, List[Tuple[str, str]]]:
+    """Split a raw HTTP head into its start line and (name, value) header pairs"""
+    lines = head.decode("latin-1").split("\r\n")
+    headers = []
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+def build_head(start_line: str, headers: List[Tuple[str, str]]) -> bytes:
+    return ("\r\n".join([start_line] + [f"{name}: {value}" for name, value in headers]) + "\r\n\r\n").encode("latin-1")
+
+def header_value(headers: List[Tuple[str, str]], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+def replace_header(headers: List[Tuple[str, str]], name: str, value: str) -> List[Tuple[str, str]]:
+    return [(k, v) for k, v in headers if k.lower() != name.lower()] + [(name, value)]
+
+def session_key(method: str, target: str, body: bytes) -> Tuple[Optional[str], bytes]:
+    """Find the session a request belongs to, assigning one to new /chat conversations"""
+    url = urlsplit(target)
+    session_ids = parse_qs(url.query).get("session_id")
+    if session_ids:
+        return session_ids[0], body
+
+    parts = url.path.strip("/").split("/")
+    if len(parts) >= 2 and parts[0] == "session":
+        return parts[1], body
+
+    if method == "POST" and url.path == "/chat":
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None, body
+        if not isinstance(payload, dict):
+            return None, body
+        # New conversations get their id here so every later turn hashes to the same worker
+        if not payload.get("session_id"):
+            payload["session_id"] = str(uuid.uuid4())
+            body = json.dumps(payload).encode("utf-8")
+        return str(payload["session_id"]), body
+
+    return None, body
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+async def relay_response(head: bytes, upstream: asyncio.StreamReader, client: asyncio.StreamWriter, method: str) -> bool:
+    """Copy one HTTP response, whose head was already read, from a worker to the client;
+    returns False if the worker closes the connection"""
+    client.write(head)
+    start_line, headers = parse_head(head)
+    status = int(start_line.split()[1])
+
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        pass
+    elif (header_value(headers, "transfer-encoding") or "").lower() == "chunked":
+        while True:
+            size_line = await upstream.readuntil(b"\r\n")
+            client.write(size_line)
+            size = int(size_line.split(b";")[0], 16)
+            client.write(await upstream.readexactly(size + 2))
+            if size == 0:
+                break
+    else:
+        length = header_value(headers, "content-length")
+        if length is not None:
+            client.write(await upstream.readexactly(int(length)))
+        else:
+            # Body delimited by connection close
+            while data := await upstream.read(65536):
+                client.write(data)
+            await client.drain()
+            return False
+
+    await client.drain()
+    return (header_value(headers, "connection") or "").lower() != "close"
+
+def error_response(status: str) -> bytes:
+    return f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode("latin-1")
+
+class Router:
+    """Front socket that routes every request to the worker owning its session.
+    
+    Routers hold no state beyond their connection pools and the ring is deterministic, so
+    several router processes can share the public port and still agree on every session."""
+
+    def __init__(self, host: str, worker_ports: List[int]):
+        self.host = host
+        self.ring = HashRing(worker_ports)
+        self.round_robin = itertools.cycle(worker_ports)
+
+    def pick_worker(self, key: Optional[str]) -> int:
+        # Stateless requests (catalog browse, health) can go anywhere
+        return self.ring.node_for(key) if key else next(self.round_robin)
+
+    async def handle_client(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        peer = client_writer.get_extra_info("peername")
+        client_ip = peer[0] if peer else "unknown"
+        upstreams: Dict[int, Tuple[asyncio.StreamReader, asyncio.StreamWriter, float]] = {}
+        try:
+            while True:
+                try:
+                    head = await client_reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                start_line, headers = parse_head(head)
+                method, target, version = start_line.split(" ", 2)
+                if (header_value(headers, "transfer-encoding") or "").lower() == "chunked":
+                    client_writer.write(error_response("411 Length Required"))
+                    await client_writer.drain()
+                    break
+                length = int(header_value(headers, "content-length") or 0)
+                if not 0 <= length <= MAX_REQUEST_BODY:
+                    client_writer.write(error_response("413 Content Too Large"))
+                    await client_writer.drain()
+                    break
+                body = await client_reader.readexactly(length)
+
+                key, body = session_key(method, target, body)
+                port = self.pick_worker(key)
+                headers = replace_header(headers, "Content-Length", str(len(body))) if body else headers
+                # Append rather than replace, so an address forwarded by the frontend survives
+                forwarded = header_value(headers, "x-forwarded-for")
+                headers = replace_header(headers, "X-Forwarded-For", f"{forwarded}, {client_ip}" if forwarded else client_ip)
+                request = build_head(start_line, headers) + body
+
+                if (header_value(headers, "upgrade") or "").lower() == "websocket":
+                    upstream_reader, upstream_writer = await asyncio.open_connection(self.host, port)
+                    upstream_writer.write(request)
+                    await upstream_writer.drain()
+                    await asyncio.gather(pipe(client_reader, upstream_writer), pipe(upstream_reader, client_writer))
+                    return
+
+                keep_alive = await self.forward(upstreams, port, request, method, client_writer)
+                client_wants_close = (header_value(headers, "connection") or "").lower() == "close"
+                if not keep_alive or client_wants_close or version == "HTTP/1.0":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.warning(f"Connection from {client_ip} dropped: {e}")
+        finally:
+            for _, upstream_writer, _ in upstreams.values():
+                upstream_writer.close()
+            client_writer.close()
+
+    async def forward(self, upstreams, port: int, request: bytes, method: str, client_writer: asyncio.StreamWriter) -> bool:
+        """Send a request over a pooled worker connection. Only GET/HEAD/OPTIONS are resent on a
+        fresh connection when the pooled one proves stale; a POST may already have been processed,
+        so it gets a 502 instead. Returns False when the client connection must be closed."""
+        pooled = upstreams.get(port)
+        if pooled and (pooled[0].at_eof() or time.monotonic() - pooled[2] > UPSTREAM_IDLE_LIMIT):
+            # Closed by the worker, or about to be: don't send anything on it
+            upstreams.pop(port)[1].close()
+        for attempt in range(2):
+            if port not in upstreams:
+                reader, writer = await asyncio.open_connection(self.host, port)
+                upstreams[port] = (reader, writer, time.monotonic())
+            upstream_reader, upstream_writer, _ = upstreams[port]
+            try:
+                upstream_writer.write(request)
+                await upstream_writer.drain()
+                head = await upstream_reader.readuntil(b"\r\n\r\n")
+            except (ConnectionError, asyncio.IncompleteReadError):
+                upstreams.pop(port)[1].close()
+                if attempt or method not in REPLAYABLE_METHODS:
+                    client_writer.write(error_response("502 Bad Gateway"))
+                    await client_writer.drain()
+                    return False
+                continue
+            keep_alive = await relay_response(head, upstream_reader, client_writer, method)
+            if keep_alive:
+                upstreams[port] = (upstream_reader, upstream_writer, time.monotonic())
+            else:
+                upstreams.pop(port)[1].close()
+            return True
+
+async def supervise(context, args, workers: Dict[int, multiprocessing.Process],
+                    routers: List[multiprocessing.Process], stop: asyncio.Event):
+    """Restart crashed workers on their port and crashed extra routers; sessions held by a crashed worker are lost"""
+    while not stop.is_set():
+        for port, process in list(workers.items()):
+            if not process.is_alive():
+                logger.warning(f"Worker on port {port} exited with {process.exitcode}, restarting")
+                workers[port] = start_worker(context, args.worker_host, port)
+        for i, process in enumerate(routers):
+            if not process.is_alive():
+                logger.warning(f"Router {process.name} exited with {process.exitcode}, restarting")
+                routers[i] = start_router(context, args, sorted(workers))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+async def start_routing(args, worker_ports: List[int]) -> asyncio.AbstractServer:
+    # With several routers, each binds the public port and the kernel spreads connections between them
+    router = Router(args.worker_host, worker_ports)
+    return await asyncio.start_server(router.handle_client, args.host, args.port, limit=CLIENT_HEADER_LIMIT,
+                                      backlog=2048, reuse_port=args.routers > 1)
+
+async def route_until_stopped(args, worker_ports: List[int]):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    async with await start_routing(args, worker_ports):
+        await stop.wait()
+
+def run_router(args, worker_ports: List[int]):
+    """Extra router entry point: share the public port with the master's router"""
+    asyncio.run(route_until_stopped(args, worker_ports))
+
+def start_router(context, args, worker_ports: List[int]):
+    process = context.Process(target=run_router, args=(args, worker_ports), name="router", daemon=True)
+    process.start()
+    return process
+
+async def run_master(args, context, workers: Dict[int, multiprocessing.Process], routers: List[multiprocessing.Process]):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = await start_routing(args, sorted(workers))
+    logger.info(f"Routing http://{args.host}:{args.port} through {args.routers} routers "
+                f"to {len(workers)} workers on ports {sorted(workers)}")
+    logger.info(f"Limits are per worker: up to {len(workers) * backend.MAX_SESSIONS} sessions and "
+                f"{len(workers) * backend.MAX_CONCURRENT_REQUESTS} in-flight POSTs in total, and per-IP rates "
+                f"up to {len(workers)}x {backend.IP_RATE:g}/s")
+
+    async with server:
+        await supervise(context, args, workers, routers, stop)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the chatbot backend with multiple workers and session affinity")
+    parser.add_argument("--host", default="127.0.0.1", help="Public address of the router")
+    parser.add_argument("--port", type=int, default=8001, help="Public port of the router")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of backend worker processes")
+    parser.add_argument("--worker-host", default="127.0.0.1", help="Address workers listen on")
+    parser.add_argument("--worker-base-port", type=int, default=9100, help="First private worker port")
+    parser.add_argument("--routers", type=int, default=None,
+                        help="Router processes sharing the public port via SO_REUSEPORT (default: one per 4 workers)")
+    args = parser.parse_args()
+    if args.routers is None:
+        args.routers = max(1, args.workers // 4)
+
+    # Move everything loaded so far out of the collector's reach so GC passes in the
+    # workers don't touch (and therefore copy) the shared catalog pages
+    gc.collect()
+    gc.freeze()
+
+    context = multiprocessing.get_context("fork")
+    ports = [args.worker_base_port + i for i in range(args.workers)]
+    workers = {port: start_worker(context, args.worker_host, port) for port in ports}
+    routers = []
+    try:
+        for port in ports:
+            wait_for_port(args.worker_host, port)
+        # The master routes too, so only the extra routers get their own process
+        routers = [start_router(context, args, ports) for _ in range(args.routers - 1)]
+        asyncio.run(run_master(args, context, workers, routers))
+    finally:
+        for process in routers + list(workers.values()):
+            process.terminate()
+        for process in routers + list(workers.values()):
+            process.join(timeout=5)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# soak_test.py - Simulate many concurrent multi-turn sessions and project memory per 100k sessions
+import argparse
+import gc
+import logging
+import os
+import random
+import time
+import tracemalloc
+
+os.environ.setdefault("CHATBOT_JOURNAL_DIR", "off")
+
+import backend
+from evaluate import generate_cases
+from memory_profile import format_bytes, process_rss
+
+# Turns after the opening query, cycled through so sessions look like real conversations
+FOLLOW_UPS = ["1", "eligibility", "benefits", "how to apply", "2", "documents", "only for women", "official website"]
+
+def run_sessions(count: int, turns: int, seed: int):
+    """Interleave `turns` turns across `count` sessions, so every session is alive at once"""
+    rng = random.Random(seed)
+    openers = [case["query"] for case in generate_cases(min(count, 5000), seed)]
+    session_ids = [f"soak_{i:07d}" for i in range(count)]
+    for turn in range(turns):
+        for i, session_id in enumerate(session_ids):
+            context = backend.get_or_create_session(session_id)
+            if turn == 0:
+                query = openers[i % len(openers)]
+            else:
+                query = FOLLOW_UPS[(turn - 1 + rng.randrange(len(FOLLOW_UPS))) % len(FOLLOW_UPS)]
+            backend.process_query(query, context)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per chat session and project capacity")
+    parser.add_argument("--sessions", type=int, default=2000, help="Concurrent sessions to simulate")
+    parser.add_argument("--turns", type=int, default=8, help="Turns per session")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generated opening queries")
+    parser.add_argument("--budget-mb", type=int, default=1024, help="Worker memory budget for the capacity estimate")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip allocation tracing (much faster)")
+    args = parser.parse_args()
+
+    logging.getLogger("backend").setLevel(logging.WARNING)
+    # Keep every simulated session resident instead of evicting at the production cap
+    session_cap = backend.MAX_SESSIONS
+    backend.MAX_SESSIONS = max(session_cap, args.sessions)
+
+    gc.collect()
+    rss_before = process_rss()
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    run_sessions(args.sessions, args.turns, args.seed)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    tracemalloc.stop()
+    rss_after = process_rss()
+
+    report = backend.memory_report(sample=args.sessions)
+    store = report["sessions"]
+    print(f"{store['count']} sessions x {args.turns} turns in {elapsed:.1f}s, "
+          f"{store['messages']} messages ({store['max_messages_per_session']} max per session)")
+    print(f"Catalog: {report['catalog']['schemes']} schemes, {format_bytes(report['catalog']['bytes'])}")
+    for name, size in report["indexes"].items():
+        print(f"  {name:<20}{format_bytes(size):>12}")
+
+    # Three views of the same cost: reachable objects, allocator-level and OS-level
+    estimates = {"deep size": store["estimated_bytes"]}
+    if traced is not None:
+        estimates["tracemalloc"] = traced
+    if rss_before and rss_after:
+        estimates["rss delta"] = rss_after - rss_before
+
+    print(f"\n{'measure':<14}{'per session':>14}{'per 100k':>14}{'sessions in budget':>20}")
+    budget = args.budget_mb * 1024 * 1024
+    for name, total in estimates.items():
+        per_session = total / max(1, store["count"])
+        fits = int(budget / per_session) if per_session > 0 else 0
+        print(f"{name:<14}{format_bytes(per_session):>14}{format_bytes(per_session * 100000):>14}{fits:>20,}")
+    per_session = max(estimates.values()) / max(1, store["count"])
+    print(f"\nMAX_SESSIONS={session_cap} costs about {format_bytes(per_session * session_cap)} per worker at the largest estimate")
+
+if __name__ == "__main__":
+    main()